@@ -1,11 +1,16 @@
 from typing import Final
 
 from src.problems.Base.algo.matrix_base.matrix_base import MatrixBaseAlgo
+from src.problems.Base.algo.matrix_base.matrix_base import MatrixBaseSemiNaiveAlgo
 
 from src.problems.AllPaths.algo.tensor.tensor import TensorSimpleAlgo
 from src.problems.AllPaths.algo.tensor.tensor import TensorDynamicAlgo
+from src.problems.AllPaths.algo.tensor.tensor import TensorImplicitAlgo
 
 from src.problems.SinglePath.algo.matrix_single_path.matrix_single_path_index import MatrixSingleAlgo
+from src.problems.SinglePath.algo.matrix_single_path.matrix_single_path_index import MatrixSingleUdtAlgo
+from src.problems.SinglePath.algo.matrix_shortest_path.matrix_shortest_path_index import MatrixShortestAlgo
+from src.problems.SinglePath.algo.matrix_shortest_path.matrix_shortest_path_index import MatrixShortestPackedAlgo
 
 from src.problems.MultipleSource.algo.matrix_ms.matrix_ms import MatrixMSOptAlgo
 from src.problems.MultipleSource.algo.matrix_ms.matrix_ms import MatrixMSBruteAlgo
@@ -15,17 +20,27 @@ Correspondence of algo and problem it solves
 """
 ALGO_PROBLEM: Final = {'TensorSimple': 'AllPaths',
                        'TensorDynamic': 'AllPaths',
+                       'TensorImplicit': 'AllPaths',
                        'MatrixBase': 'Base',
+                       'MatrixBaseSemiNaive': 'Base',
                        'MatrixMSBrute': 'MS',
                        'MatrixMSOpt': 'MS',
-                       'MatrixSingle': 'SinglePath'}
+                       'MatrixSingle': 'SinglePath',
+                       'MatrixSingleUDT': 'SinglePath',
+                       'MatrixShortest': 'SinglePath',
+                       'MatrixShortestPacked': 'SinglePath'}
 
 """
 Matching name of algo and its implementation
 """
 ALGO_IMPL: Final = {'TensorSimple': TensorSimpleAlgo,
                     'TensorDynamic': TensorDynamicAlgo,
+                    'TensorImplicit': TensorImplicitAlgo,
                     'MatrixBase': MatrixBaseAlgo,
+                    'MatrixBaseSemiNaive': MatrixBaseSemiNaiveAlgo,
                     'MatrixMSBrute': MatrixMSBruteAlgo,
                     'MatrixMSOpt': MatrixMSOptAlgo,
-                    'MatrixSingle': MatrixSingleAlgo}
+                    'MatrixSingle': MatrixSingleAlgo,
+                    'MatrixSingleUDT': MatrixSingleUdtAlgo,
+                    'MatrixShortest': MatrixShortestAlgo,
+                    'MatrixShortestPacked': MatrixShortestPackedAlgo}
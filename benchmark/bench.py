@@ -1,16 +1,23 @@
 import csv
-from os import listdir
+from os import listdir, cpu_count
 from os.path import isfile, exists
+from tempfile import TemporaryDirectory
 from tqdm import tqdm
 from time import time
 
+from pygraphblas import Matrix, BOOL
+
 from benchmark.algo_impl import ALGO_PROBLEM, ALGO_IMPL
 from src.graph.label_graph import LabelGraph
 from src.graph.graph import Graph
+from src.utils.graph_size import get_graph_size
+from src.utils.closure import transitive_closure, CLOSURE_STRATEGIES
+from src.utils.diagonal import identity, columns_diagonal
 from cfpq_data import cfg_from_txt
 
 GRAMMAR_DIR = 'Grammars/'
 GRAPH_DIR = 'Graphs/'
+SIDECAR_SUFFIXES = ('.meta',)
 
 
 def parse_config(config):
@@ -38,7 +45,42 @@ def get_variance(data, sample_mean):
     return sum([(x - sample_mean) ** 2 for x in data]) / float(len(data) - 1)
 
 
-def benchmark(algo, data_dir, result_dir, config, with_paths, rounds, max_len_paths):
+def get_index_bytes(algo):
+    """
+    @return: size in bytes of the values in the index built by the last solve, see MatrixContainer.element_bytes,
+    empty value if algorithm does not keep an index for paths
+    """
+    index = getattr(algo, 'res_m', None)
+    if index is None:
+        return ''
+    return index.element_bytes()
+
+
+def get_grammar_optimization(algo) -> list:
+    """
+    @return: numbers of rules and nonterminals removed from grammar before solving, see CnfGrammar.optimize,
+    empty values if algorithm does not optimize grammar
+    """
+    optimization = getattr(algo, 'grammar_optimization', None)
+    if optimization is None:
+        return ['', '']
+    return [optimization.rules_removed, optimization.nonterms_removed]
+
+
+def get_rsa_minimization(algo) -> list:
+    """
+    @return: numbers of RSA states before and after minimization, see RecursiveAutomaton.minimization,
+    empty values if algorithm does not use RSA
+    """
+    rsa = getattr(algo, 'rsa', getattr(algo, 'grammar', None))
+    minimization = getattr(rsa, 'minimization', None)
+    if minimization is None:
+        return ['', '']
+    return [minimization.states_before, minimization.states_after]
+
+
+def benchmark(algo, data_dir, result_dir, config, with_paths, rounds, max_len_paths, with_load=False,
+              with_closure=False, with_diagonal=False, with_regular=False):
     """
     Pipeline builder function for measuring performance
     @param algo: name algorithm in string
@@ -47,6 +89,10 @@ def benchmark(algo, data_dir, result_dir, config, with_paths, rounds, max_len_pa
     @param config: path to config file (csv)
     @param with_paths: flag for setting measurements for fetching paths
     @param rounds: number of measurement rounds
+    @param with_load: flag for setting measurements for loading graphs
+    @param with_closure: flag for setting measurements for strategies of transitive closure
+    @param with_diagonal: flag for setting measurements for construction of diagonal matrices
+    @param with_regular: flag for setting measurements for fast path of regular grammars
     """
     type_problem = ALGO_PROBLEM[algo]
     graph_grammar = dict()
@@ -61,10 +107,20 @@ def benchmark(algo, data_dir, result_dir, config, with_paths, rounds, max_len_pa
         grammars = {data_dir.joinpath(GRAMMAR_DIR).joinpath(f) for f in listdir(data_dir.joinpath(GRAMMAR_DIR)) if
                     isfile(data_dir.joinpath(GRAMMAR_DIR).joinpath(f))}
         graphs = {data_dir.joinpath(GRAPH_DIR).joinpath(f) for f in listdir(data_dir.joinpath(GRAPH_DIR)) if
-                  isfile(data_dir.joinpath(GRAPH_DIR).joinpath(f))}
+                  isfile(data_dir.joinpath(GRAPH_DIR).joinpath(f)) and not f.endswith(SIDECAR_SUFFIXES)}
         for graph in graphs:
             graph_grammar.update({graph: grammars})
 
+    if with_load:
+        benchmark_load(graph_grammar.keys(), result_dir, rounds)
+        benchmark_parallel_load(graph_grammar.keys(), result_dir, rounds)
+
+    if with_closure:
+        benchmark_closure(graph_grammar.keys(), result_dir, rounds)
+
+    if with_diagonal:
+        benchmark_diagonal(graph_grammar.keys(), result_dir, rounds)
+
     impl_for_algo = ALGO_IMPL[algo]
     variances = []
     if type_problem == "MS":
@@ -72,6 +128,9 @@ def benchmark(algo, data_dir, result_dir, config, with_paths, rounds, max_len_pa
     else:
         variances = benchmark_index(impl_for_algo, graph_grammar, result_dir, rounds)
 
+    if with_regular and type_problem in ['AllPaths', 'Base']:
+        benchmark_regular(impl_for_algo, graph_grammar, result_dir, rounds)
+
     if with_paths:
         if type_problem == "AllPaths": benchmark_all_paths(impl_for_algo, graph_grammar, result_dir, max_len_paths)
         if type_problem == "SinglePath": benchmark_single_path(impl_for_algo, graph_grammar, result_dir)
@@ -86,7 +145,8 @@ def benchmark_index(algo_name, data, result_dir, rounds):
     @param rounds: number of measurement rounds
     @return: variance value for each round of measurements
     """
-    header_index = ['graph', 'grammar', 'time', 'count_S', 'variance']
+    header_index = ['graph', 'grammar', 'time', 'count_S', 'variance', 'iterations', 'index_bytes', 'rules_removed',
+                    'nonterms_removed', 'rsa_states_before', 'rsa_states_after']
 
     variances = []
     for graph in data:
@@ -103,8 +163,9 @@ def benchmark_index(algo_name, data, result_dir, rounds):
 
         for grammar in data[graph]:
             algo = algo_name()
-            algo.prepare(Graph.from_txt(graph), cfg_from_txt(grammar))
+            algo.prepare(Graph.from_txt(graph, use_cache=False), cfg_from_txt(grammar))
             count_S = 0
+            iterations = 0
             times = []
             for _ in tqdm(range(rounds), desc=f'{graph.stem}-{grammar.stem}'):
                 algo.prepare_for_solve()
@@ -113,11 +174,13 @@ def benchmark_index(algo_name, data, result_dir, rounds):
                 finish = time()
                 times.append(finish - start)
                 count_S = res.matrix_S.nvals
+                iterations = res.number_iter
 
             sample_mean = get_sample_mean(times)
             variances.append(get_variance(times, sample_mean))
             csv_writer_index.writerow(
-                [graph.stem, grammar.stem, sample_mean, count_S, get_variance(times, sample_mean)])
+                [graph.stem, grammar.stem, sample_mean, count_S, get_variance(times, sample_mean), iterations,
+                 get_index_bytes(algo)] + get_grammar_optimization(algo) + get_rsa_minimization(algo))
 
     return variances
 
@@ -146,7 +209,7 @@ def benchmark_all_paths(algo_name, data, result_dir, max_len_paths):
 
         for grammar in data[graph]:
             algo = algo_name()
-            algo.prepare(Graph.from_txt(graph), cfg_from_txt(grammar))
+            algo.prepare(Graph.from_txt(graph, use_cache=False), cfg_from_txt(grammar))
             res = algo.solve()
             for elem in tqdm(res.matrix_S, desc=f'{graph.stem}-{grammar.stem}-paths'):
                 algo.prepare_for_exctract_paths()
@@ -164,6 +227,7 @@ def benchmark_single_path(algo_name, data, result_dir):
     @param result_dir: directory for uploading results of measurement
     """
     header_paths = ['graph', 'grammar', 'len_path', 'time']
+    header_batch = ['graph', 'grammar', 'method', 'count_paths', 'count_edges', 'time', 'paths_per_second']
 
     for graph in data:
         result_paths_file_path = result_dir.joinpath(f'{graph.stem}-{algo_name.__name__}-singlepaths')
@@ -181,15 +245,34 @@ def benchmark_single_path(algo_name, data, result_dir):
         if not exists(result_paths_file_path):
             csv_writer_paths.writerow(header_paths)
 
+        result_batch_file_path = result_dir.joinpath(f'{graph.stem}-{algo_name.__name__}-singlepaths-batch')
+        append_header = not exists(result_batch_file_path)
+        batch_csv = open(result_batch_file_path, mode='a', newline='\n')
+        csv_writer_batch = csv.writer(batch_csv, delimiter=',', quoting=csv.QUOTE_NONNUMERIC, escapechar=' ')
+        if append_header:
+            csv_writer_batch.writerow(header_batch)
+
         for grammar in data[graph]:
             algo = algo_name()
-            algo.prepare(Graph.from_txt(graph), cfg_from_txt(grammar))
+            algo.prepare(Graph.from_txt(graph, use_cache=False), cfg_from_txt(grammar))
             res = algo.solve()
+            count_edges, total_time = 0, 0
             for elem in tqdm(res.matrix_S, desc=f'{graph.stem}-{grammar}-paths'):
                 start = time()
-                paths = algo.getPath(elem[0], elem[1], "S")
+                path = algo.getPath(elem[0], elem[1], "S")
                 finish = time()
-                csv_writer_paths.writerow([graph.stem, grammar.stem, paths, finish - start])
+                csv_writer_paths.writerow([graph.stem, grammar.stem, len(path), finish - start])
+                count_edges += len(path)
+                total_time += finish - start
+            csv_writer_batch.writerow([graph.stem, grammar.stem, 'getPath', res.matrix_S.nvals, count_edges,
+                                       total_time, res.matrix_S.nvals / total_time if total_time > 0 else 0])
+
+            rows, cols, _ = res.matrix_S.to_lists()
+            start = time()
+            offsets, edges = algo.get_paths_batch(list(zip(rows, cols)), "S")
+            finish = time()
+            csv_writer_batch.writerow([graph.stem, grammar.stem, 'batch', len(rows), len(edges), finish - start,
+                                       len(rows) / (finish - start) if finish > start else 0])
 
 
 def benchmark_ms(algo_name, data, result_dir):
@@ -199,7 +282,8 @@ def benchmark_ms(algo_name, data, result_dir):
     @param data: dictionary in format {path to graph: list of paths to grammars}
     @param result_dir: directory for uploading results of measurement
     """
-    header_index = ['graph', 'grammar', 'size_chunk', 'time', 'count_S']
+    header_index = ['graph', 'grammar', 'size_chunk', 'time', 'count_S', 'rules_removed', 'nonterms_removed',
+                    'rsa_states_before', 'rsa_states_after']
 
     chunk_sizes = [1, 2, 4, 8, 16, 32, 50, 100, 500, 1000, 5000, 10000, None]
 
@@ -222,7 +306,7 @@ def benchmark_ms(algo_name, data, result_dir):
         g = LabelGraph.from_txt(graph)
         for grammar in data[graph]:
             algo = algo_name()
-            algo.prepare(Graph.from_txt(graph), cfg_from_txt(grammar))
+            algo.prepare(Graph.from_txt(graph, use_cache=False), cfg_from_txt(grammar))
             for chunk_size in chunk_sizes:
                 chunks = []
                 if chunk_size is None:
@@ -237,4 +321,291 @@ def benchmark_ms(algo_name, data, result_dir):
                     finish = time()
 
                     csv_writer_index.writerow(
-                        [graph.stem, grammar.stem, chunk_size, finish - start, res.matrix_S.nvals])
+                        [graph.stem, grammar.stem, chunk_size, finish - start, res.matrix_S.nvals] +
+                        get_grammar_optimization(algo) + get_rsa_minimization(algo))
+
+
+def load_bool_graph_by_elements(path):
+    """
+    Reference loader that sets matrix elements one at a time
+    @param path: path to file with graph
+    @return: dictionary in format {label: matrix}
+    """
+    size = get_graph_size(path)
+    matrices = dict()
+    with open(path, 'r') as f:
+        for line in f.readlines():
+            v, label, to = line.split()
+            v, to = int(v), int(to)
+            if label not in matrices:
+                matrices[label] = Matrix.sparse(BOOL, size, size)
+            matrices[label][v, to] = True
+    return matrices
+
+
+def benchmark_load(graphs, result_dir, rounds):
+    """
+    Measurement function for loading graphs: element by element versus bulk construction
+    @param graphs: paths to graphs
+    @param result_dir: directory for uploading results of measurement
+    @param rounds: number of measurement rounds
+    """
+    header_load = ['graph', 'count_edges', 'time_by_elements', 'time_bulk', 'speedup', 'time_cache']
+
+    result_load_file_path = result_dir.joinpath('graphs-load')
+
+    append_header = False
+    if not exists(result_load_file_path):
+        append_header = True
+
+    result_csv = open(result_load_file_path, mode='a', newline='\n')
+    csv_writer_load = csv.writer(result_csv, delimiter=',', quoting=csv.QUOTE_NONNUMERIC, escapechar=' ')
+
+    if append_header:
+        csv_writer_load.writerow(header_load)
+
+    for graph in graphs:
+        times_by_elements = []
+        times_bulk = []
+        times_cache = []
+        count_edges = 0
+        with TemporaryDirectory() as cache_dir:
+            Graph.from_txt(graph, cache_dir=cache_dir).save_cache()
+            for _ in tqdm(range(rounds), desc=f'{graph.stem}-load'):
+                start = time()
+                load_bool_graph_by_elements(graph)
+                finish = time()
+                times_by_elements.append(finish - start)
+
+                g = Graph.from_txt(graph, use_cache=False)
+                start = time()
+                g.load_bool_graph()
+                finish = time()
+                times_bulk.append(finish - start)
+                count_edges = g.get_number_of_edges()
+
+                g = Graph.from_txt(graph, cache_dir=cache_dir)
+                start = time()
+                g.load_bool_graph()
+                finish = time()
+                times_cache.append(finish - start)
+
+        time_by_elements = get_sample_mean(times_by_elements)
+        time_bulk = get_sample_mean(times_bulk)
+        csv_writer_load.writerow([graph.stem, count_edges, time_by_elements, time_bulk, time_by_elements / time_bulk,
+                                  get_sample_mean(times_cache)])
+
+
+def benchmark_parallel_load(graphs, result_dir, rounds):
+    """
+    Measurement function for scaling of parallel loading of graphs by number of worker processes
+    @param graphs: paths to graphs
+    @param result_dir: directory for uploading results of measurement
+    @param rounds: number of measurement rounds
+    """
+    header_load = ['graph', 'workers', 'time', 'speedup']
+
+    workers_counts = [2 ** i for i in range(cpu_count().bit_length()) if 2 ** i <= cpu_count()]
+    if workers_counts[-1] != cpu_count():
+        workers_counts.append(cpu_count())
+
+    result_load_file_path = result_dir.joinpath('graphs-parallel-load')
+
+    append_header = False
+    if not exists(result_load_file_path):
+        append_header = True
+
+    result_csv = open(result_load_file_path, mode='a', newline='\n')
+    csv_writer_load = csv.writer(result_csv, delimiter=',', quoting=csv.QUOTE_NONNUMERIC, escapechar=' ')
+
+    if append_header:
+        csv_writer_load.writerow(header_load)
+
+    for graph in graphs:
+        sequential_time = None
+        for workers in workers_counts:
+            times = []
+            for _ in tqdm(range(rounds), desc=f'{graph.stem}-load-{workers}'):
+                g = Graph.from_txt(graph, use_cache=False, workers=workers)
+                start = time()
+                g.load_bool_graph()
+                finish = time()
+                times.append(finish - start)
+
+            sample_mean = get_sample_mean(times)
+            if sequential_time is None:
+                sequential_time = sample_mean
+            csv_writer_load.writerow([graph.stem, workers, sample_mean, sequential_time / sample_mean])
+
+
+def benchmark_closure(graphs, result_dir, rounds):
+    """
+    Measurement function for strategies of transitive closure on matrix of all edges of graph
+    @param graphs: paths to graphs
+    @param result_dir: directory for uploading results of measurement
+    @param rounds: number of measurement rounds
+    """
+    header_closure = ['graph', 'strategy', 'time', 'rounds', 'count_edges', 'speedup']
+
+    result_closure_file_path = result_dir.joinpath('graphs-closure')
+
+    append_header = False
+    if not exists(result_closure_file_path):
+        append_header = True
+
+    result_csv = open(result_closure_file_path, mode='a', newline='\n')
+    csv_writer_closure = csv.writer(result_csv, delimiter=',', quoting=csv.QUOTE_NONNUMERIC, escapechar=' ')
+
+    if append_header:
+        csv_writer_closure.writerow(header_closure)
+
+    for graph in graphs:
+        g = Graph.from_txt(graph, use_cache=False)
+        g.load_bool_graph()
+        edges = Matrix.sparse(BOOL, g.matrices_size, g.matrices_size)
+        for label in g:
+            edges += g[label]
+
+        naive_time = None
+        for strategy in CLOSURE_STRATEGIES:
+            times = []
+            closure_rounds = 0
+            count_edges = 0
+            for _ in tqdm(range(rounds), desc=f'{graph.stem}-closure-{strategy}'):
+                m = edges.dup()
+                start = time()
+                closure_rounds = transitive_closure(m, strategy)
+                finish = time()
+                times.append(finish - start)
+                count_edges = m.nvals
+
+            sample_mean = get_sample_mean(times)
+            if naive_time is None:
+                naive_time = sample_mean
+            csv_writer_closure.writerow([graph.stem, strategy, sample_mean, closure_rounds, count_edges,
+                                         naive_time / sample_mean])
+
+
+def identity_by_elements(size):
+    m = Matrix.sparse(BOOL, size, size)
+    for i in range(size):
+        m[i, i] = True
+    return m
+
+
+def columns_diagonal_by_elements(m):
+    res = Matrix.sparse(BOOL, m.ncols, m.ncols)
+    for j, _ in m.T.reduce_vector(BOOL.ANY_MONOID):
+        res[j, j] = True
+    return res
+
+
+def benchmark_diagonal(graphs, result_dir, rounds):
+    """
+    Measurement function for construction of diagonal matrices element by element versus one bulk operation:
+    identity matrix (eps rules) and diagonal of non-empty columns of all edges (sources of MS algorithms)
+    @param graphs: paths to graphs
+    @param result_dir: directory for uploading results of measurement
+    @param rounds: number of measurement rounds
+    """
+    header_diagonal = ['graph', 'count_vertices', 'primitive', 'elements_time', 'bulk_time', 'speedup']
+
+    result_diagonal_file_path = result_dir.joinpath('graphs-diagonal')
+
+    append_header = False
+    if not exists(result_diagonal_file_path):
+        append_header = True
+
+    result_csv = open(result_diagonal_file_path, mode='a', newline='\n')
+    csv_writer_diagonal = csv.writer(result_csv, delimiter=',', quoting=csv.QUOTE_NONNUMERIC, escapechar=' ')
+
+    if append_header:
+        csv_writer_diagonal.writerow(header_diagonal)
+
+    for graph in graphs:
+        g = Graph.from_txt(graph, use_cache=False)
+        g.load_bool_graph()
+        edges = Matrix.sparse(BOOL, g.matrices_size, g.matrices_size)
+        for label in g:
+            edges += g[label]
+
+        primitives = {'identity': (lambda: identity_by_elements(g.matrices_size), lambda: identity(g.matrices_size)),
+                      'columns': (lambda: columns_diagonal_by_elements(edges), lambda: columns_diagonal(edges))}
+        for primitive, (by_elements, bulk) in primitives.items():
+            elements_times = []
+            bulk_times = []
+            for _ in tqdm(range(rounds), desc=f'{graph.stem}-diagonal-{primitive}'):
+                start = time()
+                by_elements()
+                finish = time()
+                elements_times.append(finish - start)
+
+                start = time()
+                bulk()
+                finish = time()
+                bulk_times.append(finish - start)
+
+            elements_time = get_sample_mean(elements_times)
+            bulk_time = get_sample_mean(bulk_times)
+            csv_writer_diagonal.writerow([graph.stem, g.matrices_size, primitive, elements_time, bulk_time,
+                                          elements_time / bulk_time])
+
+
+def get_grammar_class(rsa):
+    """
+    @param rsa: RSA of grammar
+    @return: 'non-recursive', 'regular' (only tail recursion) or 'context-free'
+    """
+    order = rsa.get_regular_order()
+    if order is None:
+        return 'context-free'
+    for component in order:
+        for box in component:
+            for state in rsa.boxes[box]:
+                if any(label in component for _, label in rsa.out_states.get(state, [])):
+                    return 'regular'
+    return 'non-recursive'
+
+
+def benchmark_regular(algo_name, data, result_dir, rounds):
+    """
+    Measurement function for fast path of regular grammars: solving with and without it
+    @param algo_name: concrete implementation of the algorithm, it has to support fast_path
+    @param data: dictionary in format {path to graph: list of paths to grammars}
+    @param result_dir: directory for uploading results of measurement
+    @param rounds: number of measurement rounds
+    """
+    header_regular = ['graph', 'grammar', 'grammar_class', 'fixpoint_time', 'fast_path_time', 'speedup']
+
+    result_regular_file_path = result_dir.joinpath(f'{algo_name.__name__}-regular')
+
+    append_header = False
+    if not exists(result_regular_file_path):
+        append_header = True
+
+    result_csv = open(result_regular_file_path, mode='a', newline='\n')
+    csv_writer_regular = csv.writer(result_csv, delimiter=',', quoting=csv.QUOTE_NONNUMERIC, escapechar=' ')
+
+    if append_header:
+        csv_writer_regular.writerow(header_regular)
+
+    for graph in data:
+        for grammar in data[graph]:
+            algo = algo_name()
+            algo.prepare(Graph.from_txt(graph, use_cache=False), cfg_from_txt(grammar))
+            rsa = algo.rsa if hasattr(algo, 'rsa') else algo.grammar
+            grammar_class = 'context-free' if rsa is None else get_grammar_class(rsa)
+            mean_times = dict()
+            for fast_path in [False, True]:
+                algo.fast_path = fast_path
+                times = []
+                for _ in tqdm(range(rounds), desc=f'{graph.stem}-{grammar.stem}-fast_path-{fast_path}'):
+                    algo.prepare_for_solve()
+                    start = time()
+                    algo.solve()
+                    finish = time()
+                    times.append(finish - start)
+                mean_times[fast_path] = get_sample_mean(times)
+
+            csv_writer_regular.writerow([graph.stem, grammar.stem, grammar_class, mean_times[False],
+                                         mean_times[True], mean_times[False] / mean_times[True]])
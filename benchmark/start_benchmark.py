@@ -39,6 +39,14 @@ if __name__ == '__main__':
                                                                            '(Default: round = 5)')
     parser.add_argument('-max_len_paths', dest='max_len_paths', default=5, type=int, help='Limit on the length of '
                                                                                           'the retrieved paths')
+    parser.add_argument('-with_load', dest='with_load', type=bool, default=False, help='Is it necessary to measure '
+                                                                                       'the loading of graphs?')
+    parser.add_argument('-with_closure', dest='with_closure', type=bool, default=False,
+                        help='Is it necessary to measure the strategies of transitive closure?')
+    parser.add_argument('-with_diagonal', dest='with_diagonal', type=bool, default=False,
+                        help='Is it necessary to measure the construction of diagonal matrices?')
+    parser.add_argument('-with_regular', dest='with_regular', type=bool, default=False,
+                        help='Is it necessary to measure the fast path of regular grammars?')
     args = parser.parse_args()
     benchmark(args.algo,
               Path(args.data_dir),
@@ -46,4 +54,8 @@ if __name__ == '__main__':
               args.config,
               args.with_paths,
               args.rounds,
-              args.max_len_paths)
+              args.max_len_paths,
+              args.with_load,
+              args.with_closure,
+              args.with_diagonal,
+              args.with_regular)
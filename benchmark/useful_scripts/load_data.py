@@ -9,6 +9,8 @@ from cfpq_data.grammars.samples.two_cycles import brackets
 
 from pathlib import Path
 
+from src.graph.graph_meta import write_graph_meta
+
 import argparse
 import os
 
@@ -47,22 +49,26 @@ CONFIG = {
 }
 
 
-def graph_to_txt(graph, path, config):
+def graph_to_txt(graph, path, config, with_inverse=True):
     with open(path, "w") as fout:
         for u, v, edge_labels in graph.edges(data=True):
             for label in edge_labels.values():
                 if config[str(label)] == "other":
                     continue
                 fout.write(f"{u} {config[str(label)]} {v}\n")
-                fout.write(f"{v} {config[str(label)]}_r {u}\n")
+                if with_inverse:
+                    fout.write(f"{v} {config[str(label)]}_r {u}\n")
+    if not with_inverse:
+        # inverse edges are derived by the graph as transposes of base labels
+        write_graph_meta(path, inverse_suffix="_r")
 
 
-def load_graph_by_type(type):
+def load_graph_by_type(type, with_inverse=True):
     for name_graph in DATASET[type].keys():
-        load_graph_by_name(name_graph)
+        load_graph_by_name(name_graph, with_inverse)
 
 
-def load_graph_by_name(name_graph):
+def load_graph_by_name(name_graph, with_inverse=True):
     g = nodes_to_integers(graph_from_dataset(name_graph, verbose=False), verbose=False)
     config_cur = dict()
     for label in get_labels(g, verbose=False):
@@ -75,7 +81,7 @@ def load_graph_by_name(name_graph):
             else:
                 l = CONFIG.get(label_str[1], "other")
                 config_cur.update({str(label): l})
-    graph_to_txt(g, DEFAULT_GRAPH_PATH.joinpath(name_graph), config_cur)
+    graph_to_txt(g, DEFAULT_GRAPH_PATH.joinpath(name_graph), config_cur, with_inverse)
 
 
 def load_grammar_by_type(name_grammar):
@@ -89,6 +95,8 @@ if __name__ == '__main__':
     types_graphs = DATASET.keys()
     parser.add_argument('-graph_type', dest="graph_type", default=None, choices=types_graphs)
     parser.add_argument('-graph_name', dest="graph_name", default=None)
+    parser.add_argument('-without_inverse', dest="without_inverse", default=False, type=bool,
+                        help="do not write _r edges, the graph derives them from base labels")
     types_grammars = GRAMMARS_BY_TYPE.keys()
     parser.add_argument('-grammar_type', dest="grammar_type", default=None, choices=types_grammars)
 
@@ -104,10 +112,10 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
     if args.graph_type is not None:
-        load_graph_by_type(args.graph_type)
+        load_graph_by_type(args.graph_type, not args.without_inverse)
 
     if args.graph_name is not None:
-        load_graph_by_name(args.graph_name)
+        load_graph_by_name(args.graph_name, not args.without_inverse)
 
     if args.grammar_type is not None:
         load_grammar_by_type(args.grammar_type)
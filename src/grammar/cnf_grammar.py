@@ -1,6 +1,21 @@
 from cfpq_data import cnf_from_cfg
 from pyformlang.cfg import CFG
 
+from src.grammar.grammar_cache import GRAMMAR_CACHE
+
+
+class GrammarOptimization:
+    """
+    Result of CnfGrammar.optimize
+    """
+
+    def __init__(self, rules_removed: int, nonterms_removed: int):
+        self.rules_removed = rules_removed
+        self.nonterms_removed = nonterms_removed
+
+    def __str__(self):
+        return f'{self.rules_removed} rules and {self.nonterms_removed} nonterminals are removed from grammar'
+
 
 class CnfGrammar:
     """
@@ -14,9 +29,11 @@ class CnfGrammar:
         self.simple_rules = []
         self.complex_rules = []
         self.eps_rules = []
+        self.rules_by_head = None
 
     def __setitem__(self, key, value):
         if (isinstance(value, tuple) or isinstance(value, list)) and 1 <= len(value) <= 2:
+            self.rules_by_head = None
             self.nonterms.add(key)
             if len(value) == 1:
                 self.simple_rules.append((key, value[0]))
@@ -29,16 +46,54 @@ class CnfGrammar:
             raise Exception('value must be str, (str, str) or [str, str]')
 
     @classmethod
-    def from_cfg(cls, cfg: CFG):
-        cnf = CnfGrammar()
+    def from_cfg(cls, cfg: CFG, use_cache=True):
+        """
+        Build grammar in CNF from a given cfpq_data context-free grammar
+        @param cfg: CFG on which grammar is built
+        @param use_cache: flag to take compiled rules from the grammar cache, the same grammar is converted once
+        @return: initialized class
+        """
+        if not use_cache:
+            return CnfGrammar.from_compiled(CnfGrammar.compile(cfg))
+
+        key = GRAMMAR_CACHE.get_key('cnf', cfg)
+        compiled = GRAMMAR_CACHE.get(key)
+        if compiled is None:
+            compiled = CnfGrammar.compile(cfg)
+            GRAMMAR_CACHE.put(key, compiled)
+        return CnfGrammar.from_compiled(compiled)
+
+    @staticmethod
+    def compile(cfg: CFG) -> dict:
+        """
+        Convert grammar into CNF
+        @param cfg: CFG to convert
+        @return: json-serializable start nonterminal, eps rules and rules in format [head, body]
+        """
         base_cnf = cnf_from_cfg(cfg)
-        cnf.start_nonterm = base_cnf.start_symbol.to_text()
+        compiled = {'start_nonterm': base_cnf.start_symbol.to_text(), 'eps_rules': [], 'rules': []}
 
         for product in base_cnf.productions:
             if not product.body:
-                cnf.eps_rules.append(product.head.to_text().strip('"'))
+                compiled['eps_rules'].append(product.head.to_text().strip('"'))
             else:
-                cnf[product.head.to_text().strip('"')] = [x.to_text().strip('"') for x in product.body]
+                compiled['rules'].append([product.head.to_text().strip('"'),
+                                          [x.to_text().strip('"') for x in product.body]])
+
+        return compiled
+
+    @classmethod
+    def from_compiled(cls, compiled: dict):
+        """
+        Build grammar from result of compile
+        @param compiled: compiled grammar
+        @return: initialized class
+        """
+        cnf = CnfGrammar()
+        cnf.start_nonterm = compiled['start_nonterm']
+        cnf.eps_rules = list(compiled['eps_rules'])
+        for head, body in compiled['rules']:
+            cnf[head] = body
 
         return cnf
 
@@ -59,3 +114,97 @@ class CnfGrammar:
                 r = r.strip().split()
                 grammar[l] = r
         return grammar
+
+    def get_rules_by_head(self) -> dict:
+        """
+        @return: complex rules indexed by head in format {head: [(r1, r2)]}, the index is built once
+        and is rebuilt only after rules are changed
+        """
+        if self.rules_by_head is None:
+            self.rules_by_head = dict()
+            for l, r1, r2 in self.complex_rules:
+                self.rules_by_head.setdefault(l, []).append((r1, r2))
+        return self.rules_by_head
+
+    def get_number_of_rules(self):
+        return len(self.simple_rules) + len(self.complex_rules) + len(self.eps_rules)
+
+    def get_number_of_nonterms(self):
+        return len(self.nonterms.union(self.eps_rules))
+
+    def optimize(self, labels=None) -> GrammarOptimization:
+        """
+        Remove rules and nonterminals that do not affect the answer: duplicate rules, rules with terminals
+        not in labels, nonterminals that derive no path or are unreachable from the start nonterminal.
+        Nonterminals with the same rules are merged into one
+        @param labels: labels of graph edges, all terminals are kept if None
+        @return: numbers of removed rules and nonterminals
+        """
+        rules_before, nonterms_before = self.get_number_of_rules(), self.get_number_of_nonterms()
+
+        simple_rules = [(l, r) for l, r in dict.fromkeys(self.simple_rules) if labels is None or r in labels]
+        complex_rules = list(dict.fromkeys(self.complex_rules))
+        eps_rules = list(dict.fromkeys(self.eps_rules))
+
+        # nonterminals deriving at least one path
+        productive = set(eps_rules).union([l for l, _ in simple_rules])
+        changed = True
+        while changed:
+            changed = False
+            for l, r1, r2 in complex_rules:
+                if l not in productive and r1 in productive and r2 in productive:
+                    productive.add(l)
+                    changed = True
+        complex_rules = [rule for rule in complex_rules if productive.issuperset(rule)]
+
+        # nonterminals reachable from the start nonterminal
+        bodies = dict()
+        for l, r1, r2 in complex_rules:
+            bodies.setdefault(l, []).extend([r1, r2])
+        reachable = {self.start_nonterm}
+        stack = [self.start_nonterm]
+        while len(stack) > 0:
+            for r in bodies.get(stack.pop(), []):
+                if r not in reachable:
+                    reachable.add(r)
+                    stack.append(r)
+        simple_rules = [rule for rule in simple_rules if rule[0] in reachable]
+        complex_rules = [rule for rule in complex_rules if rule[0] in reachable]
+        eps_rules = [l for l in eps_rules if l in reachable]
+
+        # merge nonterminals with the same rules until there is nothing to merge
+        while True:
+            rules = dict()
+            for l, r in simple_rules:
+                rules.setdefault(l, (set(), set(), set()))[0].add(r)
+            for l, r1, r2 in complex_rules:
+                rules.setdefault(l, (set(), set(), set()))[1].add((r1, r2))
+            for l in eps_rules:
+                rules.setdefault(l, (set(), set(), set()))[2].add(l)
+
+            groups = dict()
+            for l in sorted(rules, key=lambda nonterm: (nonterm != self.start_nonterm, nonterm)):
+                key = (frozenset(rules[l][0]), frozenset(rules[l][1]), len(rules[l][2]) > 0)
+                groups.setdefault(key, []).append(l)
+            merged = {l: group[0] for group in groups.values() for l in group[1:]}
+            if len(merged) == 0:
+                break
+
+            simple_rules = list(dict.fromkeys([(merged.get(l, l), r) for l, r in simple_rules]))
+            complex_rules = list(dict.fromkeys([(merged.get(l, l), merged.get(r1, r1), merged.get(r2, r2))
+                                                for l, r1, r2 in complex_rules]))
+            eps_rules = list(dict.fromkeys([merged.get(l, l) for l in eps_rules]))
+
+        self.nonterms = set()
+        self.terms = set()
+        self.simple_rules = []
+        self.complex_rules = []
+        self.eps_rules = eps_rules
+        self.rules_by_head = None
+        for l, r in simple_rules:
+            self[l] = [r]
+        for l, r1, r2 in complex_rules:
+            self[l] = [r1, r2]
+
+        return GrammarOptimization(rules_before - self.get_number_of_rules(),
+                                   nonterms_before - self.get_number_of_nonterms())
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from pyformlang.cfg import CFG
+
+from src.utils.useful_paths import GRAMMAR_CACHE_DIR
+
+GRAMMAR_CACHE_VERSION = 2
+
+
+class GrammarCache:
+    """
+    Cache of compiled grammars, for example CNF rules or RSA transitions, in memory and on disk.
+    Compiled grammar is a json-serializable dictionary stored by hash of grammar content,
+    so the same grammar given by different objects or in different processes is compiled once
+    """
+
+    def __init__(self, cache_dir=GRAMMAR_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.compiled = dict()
+
+    @staticmethod
+    def get_key(kind: str, cfg: CFG) -> str:
+        """
+        @param kind: kind of compiled grammar, for example 'cnf' or 'rsa'
+        @param cfg: source grammar
+        @return: hash of grammar content, it does not depend on the order of productions
+        """
+        productions = sorted(cfg.to_text().splitlines())
+        content = '\n'.join([str(GRAMMAR_CACHE_VERSION), kind, cfg.start_symbol.to_text()] + productions)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        return self.cache_dir.joinpath(f'{key}.json')
+
+    def get(self, key: str):
+        """
+        @param key: hash of grammar
+        @return: compiled grammar or None if it is not cached
+        """
+        if key not in self.compiled:
+            path = self.get_path(key)
+            if not path.is_file():
+                return None
+            with open(path, 'r') as f:
+                self.compiled[key] = json.load(f)
+        return self.compiled[key]
+
+    def put(self, key: str, compiled: dict):
+        """
+        Save compiled grammar in memory and on disk. Cache directory that can not be written is ignored
+        @param key: hash of grammar
+        @param compiled: json-serializable compiled grammar
+        """
+        self.compiled[key] = compiled
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.get_path(f'{key}.{os.getpid()}.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(compiled, f)
+            # replace is atomic, so concurrent processes never read partially written file
+            os.replace(tmp_path, self.get_path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        self.compiled = dict()
+        if self.cache_dir.is_dir():
+            shutil.rmtree(self.cache_dir)
+
+
+GRAMMAR_CACHE = GrammarCache()
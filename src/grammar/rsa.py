@@ -1,4 +1,4 @@
-from typing import Union
+from typing import List, Optional, Union
 
 from pygraphblas.matrix import Matrix
 from pygraphblas.types import BOOL
@@ -9,6 +9,22 @@ from pyformlang.cfg import CFG
 from cfpq_data import rsm_from_text
 from cfpq_data.grammars.rsm import RSM
 
+from src.grammar.grammar_cache import GRAMMAR_CACHE
+from src.grammar.rule_scheduler import find_strongly_connected_components
+
+
+class RsaMinimization:
+    """
+    Number of RSA states before and after minimization
+    """
+
+    def __init__(self, states_before: int, states_after: int):
+        self.states_before = states_before
+        self.states_after = states_after
+
+    def __str__(self):
+        return f'RSA is minimized from {self.states_before} to {self.states_after} states'
+
 
 class RecursiveAutomaton:
     """
@@ -27,6 +43,7 @@ class RecursiveAutomaton:
         self.out_states = dict()
         self.start_nonterm = ""
         self.boxes = dict()
+        self.minimization = None
 
     def __getitem__(self, item: str) -> Matrix:
         if item not in self.matrices:
@@ -49,12 +66,28 @@ class RecursiveAutomaton:
             return RecursiveAutomaton.from_file(grammar_or_path)
 
     @classmethod
-    def from_cfg(cls, cfg: CFG):
+    def from_cfg(cls, cfg: CFG, use_cache=True):
         """
         Build RSA from a given cfpq_data context-free grammar
         @param cfg: CFG on which RSA is built
+        @param use_cache: flag to take compiled RSA from the grammar cache, the same grammar is built once
         @return: initialized class
         """
+        if not use_cache:
+            return RecursiveAutomaton.from_compiled(RecursiveAutomaton.compile(cfg))
+
+        key = GRAMMAR_CACHE.get_key('rsa', cfg)
+        compiled = GRAMMAR_CACHE.get(key)
+        if compiled is None:
+            compiled = RecursiveAutomaton.compile(cfg)
+            GRAMMAR_CACHE.put(key, compiled)
+        return RecursiveAutomaton.from_compiled(compiled)
+
+    @staticmethod
+    def compile(cfg: CFG) -> dict:
+        """
+        Build json-serializable description of RSA for a given context-free grammar, see compile_rsm
+        """
         grammar = cfg.to_text()
 
         productions = dict()
@@ -73,7 +106,7 @@ class RecursiveAutomaton:
             grammar_new += nonterminal + " -> " + productions[nonterminal] + "\n"
 
         grammar_new = grammar_new[:-1]
-        return RecursiveAutomaton.from_rsm(rsm_from_text(grammar_new))
+        return RecursiveAutomaton.compile_rsm(rsm_from_text(grammar_new))
 
     @classmethod
     def from_file(cls, path: Path):
@@ -127,52 +160,213 @@ class RecursiveAutomaton:
         @param rsm: RSM on which RSA is built
         @return: initialized class
         """
-        rsa = RecursiveAutomaton()
-        rsa.start_nonterm = rsm.start_symbol.to_text()
+        return RecursiveAutomaton.from_compiled(RecursiveAutomaton.compile_rsm(rsm))
+
+    @staticmethod
+    def compile_rsm(rsm: RSM) -> dict:
+        """
+        Number states of boxes of Recursive State Machine and collect transitions by label
+        @param rsm: RSM on which RSA is built
+        @return: json-serializable description of RSA used by from_compiled
+        """
+        compiled = {'start_nonterm': rsm.start_symbol.to_text(), 'labels': [], 'boxes': dict(),
+                    'start_state': dict(), 'finish_states': dict(), 'transitions': dict()}
         current_state = 0
-        transtion_by_label = dict()
         for nonterm, dfa in rsm.boxes:
             mapping_state = dict()
-            rsa.nonterminals.add(nonterm.to_text())
-            rsa.labels = rsa.labels.union(dfa.symbols)
-            rsa.boxes[nonterm.to_text()] = []
+            box = nonterm.to_text()
+            compiled['boxes'][box] = []
 
             for label in dfa.symbols:
-                if label not in transtion_by_label:
-                    transtion_by_label.update({label: []})
+                label = str(label.value)
+                if label not in compiled['transitions']:
+                    compiled['labels'].append(label)
+                    compiled['transitions'][label] = []
 
             dfa_dict = dfa.to_dict()
             for state in dfa_dict:
                 if state not in mapping_state:
                     mapping_state[state] = current_state
-                    rsa.boxes[nonterm.to_text()].append(current_state)
+                    compiled['boxes'][box].append(current_state)
                     current_state += 1
 
                 for trans in dfa_dict[state]:
                     if dfa_dict[state][trans] not in mapping_state:
                         mapping_state[dfa_dict[state][trans]] = current_state
-                        rsa.boxes[nonterm.to_text()].append(current_state)
+                        compiled['boxes'][box].append(current_state)
                         current_state += 1
-                    transtion_by_label[trans].append((mapping_state[state], mapping_state[dfa_dict[state][trans]]))
-            rsa.states[nonterm.to_text()] = []
-            rsa.start_state[nonterm.to_text()] = mapping_state[dfa.start_state]
-            rsa.finish_states[nonterm.to_text()] = []
-            for final_state in dfa.final_states:
-                rsa.states[nonterm.to_text()].append((mapping_state[dfa.start_state], mapping_state[final_state]))
-                rsa.finish_states[nonterm.to_text()].append(mapping_state[final_state])
-                if mapping_state[dfa.start_state] == mapping_state[final_state]:
-                    rsa.start_and_finish.add(nonterm.to_text())
-
-        rsa.matrices_size = current_state
-        for label in transtion_by_label:
-            rsa.matrices[label] = Matrix.sparse(BOOL, rsa.matrices_size, rsa.matrices_size)
-            for trans in transtion_by_label[label]:
-                rsa.matrices[label][trans[0], trans[1]] = True
-
-                if trans[0] in rsa.out_states:
-                    rsa.out_states[trans[0]].append((trans[1], label))
+                    compiled['transitions'][str(trans.value)].append(
+                        [mapping_state[state], mapping_state[dfa_dict[state][trans]]])
+
+            # states without outgoing transitions, for example start state of box with only empty word
+            for state in [dfa.start_state] + list(dfa.final_states):
+                if state not in mapping_state:
+                    mapping_state[state] = current_state
+                    compiled['boxes'][box].append(current_state)
+                    current_state += 1
+            compiled['start_state'][box] = mapping_state[dfa.start_state]
+            compiled['finish_states'][box] = [mapping_state[final_state] for final_state in dfa.final_states]
+
+        compiled['matrices_size'] = current_state
+        return RecursiveAutomaton.minimize(compiled)
+
+    @staticmethod
+    def minimize(compiled: dict) -> dict:
+        """
+        Minimize compiled RSA: remove states that are unreachable from start states of boxes or from which
+        no final state is reachable, then merge equivalent states of all boxes by partition refinement.
+        States are equivalent if they are final for the same boxes and have transitions by the same labels
+        into equivalent states, so states of different boxes are merged only if it does not change any box
+        @param compiled: result of compile_rsm before minimization
+        @return: compiled RSA with the number of states before minimization in states_before_minimization
+        """
+        size = compiled['matrices_size']
+        out_transitions = [[] for _ in range(size)]
+        in_transitions = [[] for _ in range(size)]
+        for label, transitions in compiled['transitions'].items():
+            for first, second in transitions:
+                out_transitions[first].append((label, second))
+                in_transitions[second].append((label, first))
+
+        def search(roots, edges):
+            visited = set(roots)
+            stack = list(roots)
+            while len(stack) > 0:
+                for _, state in edges[stack.pop()]:
+                    if state not in visited:
+                        visited.add(state)
+                        stack.append(state)
+            return visited
+
+        starts = set(compiled['start_state'].values())
+        finals_of = [set() for _ in range(size)]
+        for box, finals in compiled['finish_states'].items():
+            for final in finals:
+                finals_of[final].add(box)
+        useful = search(starts, out_transitions) & search([s for s in range(size) if finals_of[s]], in_transitions)
+        useful |= starts
+
+        # partition refinement starting from classes of states with the same set of boxes they finish
+        colors = dict()
+        class_of = {state: colors.setdefault(frozenset(finals_of[state]), len(colors)) for state in useful}
+        while True:
+            signatures = dict()
+            new_class_of = dict()
+            for state in sorted(useful):
+                signature = (class_of[state], tuple(sorted({(label, class_of[to])
+                                                            for label, to in out_transitions[state] if to in useful})))
+                new_class_of[state] = signatures.setdefault(signature, len(signatures))
+            stable = len(signatures) == len(set(class_of.values()))
+            class_of = new_class_of
+            if stable:
+                break
+
+        minimized = {'start_nonterm': compiled['start_nonterm'], 'labels': [], 'transitions': dict(),
+                     'boxes': {box: list(dict.fromkeys([class_of[s] for s in states if s in useful]))
+                               for box, states in compiled['boxes'].items()},
+                     'start_state': {box: class_of[state] for box, state in compiled['start_state'].items()},
+                     'finish_states': {box: list(dict.fromkeys([class_of[s] for s in finals if s in useful]))
+                                       for box, finals in compiled['finish_states'].items()},
+                     'matrices_size': len(set(class_of.values())),
+                     'states_before_minimization': size}
+        for label in compiled['labels']:
+            transitions = list(dict.fromkeys([(class_of[first], class_of[second])
+                                              for first, second in compiled['transitions'][label]
+                                              if first in useful and second in useful]))
+            if len(transitions) > 0:
+                minimized['labels'].append(label)
+                minimized['transitions'][label] = [list(trans) for trans in transitions]
+        return minimized
+
+    @classmethod
+    def from_compiled(cls, compiled: dict):
+        """
+        Build RSA from result of compile_rsm, matrices are built with one bulk operation per label
+        @param compiled: compiled RSA
+        @return: initialized class
+        """
+        rsa = RecursiveAutomaton()
+        rsa.start_nonterm = compiled['start_nonterm']
+        rsa.matrices_size = compiled['matrices_size']
+        rsa.minimization = RsaMinimization(compiled.get('states_before_minimization', rsa.matrices_size),
+                                           rsa.matrices_size)
+        rsa.labels = set(compiled['labels'])
+        for nonterm in compiled['boxes']:
+            rsa.nonterminals.add(nonterm)
+            rsa.boxes[nonterm] = list(compiled['boxes'][nonterm])
+            rsa.start_state[nonterm] = compiled['start_state'][nonterm]
+            rsa.finish_states[nonterm] = list(compiled['finish_states'][nonterm])
+            rsa.states[nonterm] = [(rsa.start_state[nonterm], final_state)
+                                   for final_state in rsa.finish_states[nonterm]]
+            if rsa.start_state[nonterm] in rsa.finish_states[nonterm]:
+                rsa.start_and_finish.add(nonterm)
+
+        for label, transitions in compiled['transitions'].items():
+            rows = [trans[0] for trans in transitions]
+            cols = [trans[1] for trans in transitions]
+            rsa.matrices[label] = Matrix.from_lists(rows, cols, [True] * len(transitions),
+                                                    nrows=rsa.matrices_size, ncols=rsa.matrices_size, typ=BOOL)
+            for first, second in transitions:
+                if first in rsa.out_states:
+                    rsa.out_states[first].append((second, label))
                 else:
-                    rsa.out_states[trans[0]] = [(trans[1], label)]
+                    rsa.out_states[first] = [(second, label)]
 
         rsa.terminals = rsa.labels.difference(rsa.nonterminals)
         return rsa
+
+    def get_nonterminal_components(self) -> List[list]:
+        """
+        @return: strongly connected components of nonterminals dependency graph (box -> nonterminals of its
+        transitions), every component follows all components it depends on
+        """
+        dependencies = {nonterminal: [label for state in self.boxes[nonterminal]
+                                      for _, label in self.out_states.get(state, []) if label in self.nonterminals]
+                        for nonterminal in self.nonterminals}
+        return find_strongly_connected_components(sorted(self.nonterminals), dependencies)
+
+    def is_tail_call(self, box: str, state: int) -> bool:
+        """
+        @return: whether transition of box into state by nonterminal finishes the box, i.e. state is final
+        and has no outgoing transitions
+        """
+        return state in self.finish_states[box] and len(self.out_states.get(state, [])) == 0
+
+    @staticmethod
+    def is_regular_cfg(cfg: CFG) -> bool:
+        """
+        Condition of get_regular_order checked on productions of CFG without building RSA: nonterminals
+        of every component are used inside the component only as the last symbol of productions,
+        then their transitions in RSA of cfg are tail calls
+        @param cfg: CFG on which RSA is built
+        @return: whether RSA of cfg is regular
+        """
+        bodies = dict()
+        for line in cfg.to_text().split("\n")[:-1]:
+            head, body = line.split(" -> ")
+            bodies.setdefault(head, []).append(body.split())
+
+        dependencies = {head: [symbol for body in bodies[head] for symbol in body if symbol in bodies]
+                        for head in bodies}
+        for component in find_strongly_connected_components(sorted(bodies), dependencies):
+            for head in component:
+                for body in bodies[head]:
+                    if any(symbol in component for symbol in body[:-1]):
+                        return False
+        return True
+
+    def get_regular_order(self) -> Optional[List[list]]:
+        """
+        RSA is regular if nonterminals of every component are used inside the component only as tail calls,
+        then the language of every box is regular given the boxes of components it depends on
+        @return: components of nonterminals in evaluation order if RSA is regular, otherwise None
+        """
+        components = self.get_nonterminal_components()
+        for component in components:
+            for box in component:
+                for state in self.boxes[box]:
+                    for to, label in self.out_states.get(state, []):
+                        if label in component and not self.is_tail_call(box, to):
+                            return None
+        return components
+
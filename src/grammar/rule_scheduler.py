@@ -0,0 +1,113 @@
+from typing import Callable, Dict, Iterable, List
+
+from src.grammar.cnf_grammar import CnfGrammar
+
+
+def find_strongly_connected_components(vertices: Iterable, edges: Dict) -> List[list]:
+    """
+    Tarjan's algorithm without recursion
+    @param vertices: vertices of graph
+    @param edges: dictionary in format {vertex: list of vertices it depends on}
+    @return: list of components, every component follows all components it depends on
+    """
+    index = dict()
+    low = dict()
+    stack = []
+    on_stack = set()
+    components = []
+
+    def visit(v):
+        index[v] = low[v] = len(index)
+        stack.append(v)
+        on_stack.add(v)
+        return v, iter(edges.get(v, ()))
+
+    for root in vertices:
+        if root in index:
+            continue
+        work = [visit(root)]
+        while work:
+            v, children = work[-1]
+            for w in children:
+                if w not in index:
+                    work.append(visit(w))
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.remove(w)
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(component)
+    return components
+
+
+class Stratum:
+    """
+    Strongly connected component of nonterminals dependency graph with complex rules whose heads are in it
+    """
+
+    def __init__(self, nonterms: set, rules: list):
+        self.nonterms = nonterms
+        self.rules = rules
+        self.is_recursive = any(r1 in nonterms or r2 in nonterms for _, r1, r2 in rules)
+
+        # rules_with_nonterminal: nonterminal of stratum -> indices of rules with it in the right side
+        self.rules_with_nonterminal = dict()
+        for i, (_, r1, r2) in enumerate(rules):
+            for r in {r1, r2} & nonterms:
+                self.rules_with_nonterminal.setdefault(r, []).append(i)
+
+
+class RuleScheduler:
+    """
+    Evaluation order of complex rules of grammar in CNF. Strongly connected components of nonterminals
+    dependency graph (head -> nonterminals of the right side) are evaluated in topological order:
+    rules of non-recursive component are applied once, rules of recursive component are applied until
+    fixpoint, and after the first round only rules with changed nonterminal in the right side are recalculated
+    """
+
+    def __init__(self, grammar: CnfGrammar):
+        dependencies = dict()
+        for l, r1, r2 in grammar.complex_rules:
+            dependencies.setdefault(l, []).extend([r1, r2])
+
+        component_of = dict()
+        components = find_strongly_connected_components(sorted(grammar.nonterms), dependencies)
+        for i, component in enumerate(components):
+            for nonterm in component:
+                component_of[nonterm] = i
+
+        rules_of_component = [[] for _ in components]
+        for rule in grammar.complex_rules:
+            rules_of_component[component_of[rule[0]]].append(rule)
+
+        self.strata = [Stratum(set(component), rules) for component, rules in zip(components, rules_of_component)
+                       if len(rules) > 0]
+
+    def run(self, apply_rule: Callable[[str, str, str], bool]) -> int:
+        """
+        Apply rules until fixpoint
+        @param apply_rule: function that by rule (l, r1, r2) updates l and returns whether l is changed
+        @return: number of rounds over rules
+        """
+        rounds = 0
+        for stratum in self.strata:
+            to_recalculate = set(range(len(stratum.rules)))
+            while len(to_recalculate) > 0:
+                rounds += 1
+                current, to_recalculate = sorted(to_recalculate), set()
+                for i in current:
+                    l, r1, r2 = stratum.rules[i]
+                    if apply_rule(l, r1, r2) and stratum.is_recursive:
+                        to_recalculate.update(stratum.rules_with_nonterminal.get(l, []))
+        return rounds
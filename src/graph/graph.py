@@ -1,81 +1,322 @@
 from pathlib import Path
-from tqdm import tqdm
+import numpy as np
 
 from pygraphblas import Matrix, BOOL
 from src.graph.index_graph import SAVEMIDDLETYPE
+from src.graph.label_graph import LabelGraph
 from src.graph.length_graph import SAVELENGTHTYPE
+from src.graph.triplets import read_edges_by_label, read_edges_by_label_parallel, build_matrix
+from src.graph.graph_cache import GraphCache
+from src.graph.graph_meta import read_graph_meta
+from src.graph.matrix_container import MatrixContainer
+from src.graph.vertex_map import VertexMap
 
-from src.utils.graph_size import get_graph_size
+INVERSE_SUFFIX = ''
 
 
-class Graph:
+class Graph(MatrixContainer):
     def __init__(self):
+        super().__init__()
         self.path = "path/to/graph"
-        self.type = None
-        self.matrices_size = 0
-        self.matrices = dict()
+        self.use_cache = True
+        self.cache_dir = None
+        self.skipped_edges = 0
+        self.compact_ids = False
+        self.workers = 1
+        self.vertex_map = None
+        self.is_loaded = False
+        self.matrices_by_type = dict()
+        self.loaded_labels = dict()
+        self.inverse_suffix = INVERSE_SUFFIX
 
     def __getitem__(self, item: str) -> Matrix:
-        if item not in self.matrices:
-            self.matrices[item] = Matrix.sparse(self.type, self.matrices_size, self.matrices_size)
-        return self.matrices[item]
+        m = self.get_matrix(item, self.type)
+        return self.empty() if m is None else m
 
-    def __setitem__(self, key, value):
-        self.matrices[key] = value
+    def get_matrix(self, item: str, typ):
+        """
+        @param item: label
+        @param typ: type of matrices, every type has its own set of loaded matrices
+        @return: matrix of label loaded with type typ or None if there is no such matrix
+        """
+        return self.matrices_by_type.get(typ, dict()).get(item)
 
-    def __iter__(self):
-        return self.matrices.__iter__()
+    def get_inverse_base(self, label: str):
+        """
+        Inverse label, for example subClassOf_r, is derived on load from its base label with swapped ends of edges
+        if it is not in the file and the suffix of inverse labels is set
+        @param label: label of edges
+        @return: base label or None if label is not inverse
+        """
+        if not self.inverse_suffix or not label.endswith(self.inverse_suffix) or label == self.inverse_suffix:
+            return None
+        return label[:-len(self.inverse_suffix)]
+
+    def with_inverse_bases(self, labels):
+        """
+        @return: labels with base labels of inverse ones, None if labels is None
+        """
+        if labels is None:
+            return None
+        return set(labels).union(filter(None, map(self.get_inverse_base, labels)))
 
     def get_number_of_vertices(self):
         return self.matrices_size
 
+    def view(self, writable=(), typ=None):
+        """
+        Create lightweight per-query overlay over the loaded graph
+        @param writable: labels of matrices derived by the query, for example nonterminals
+        @param typ: type of matrices read by the view, by default the type of the last load
+        @return: view that reads matrices of this graph and keeps writable ones in the overlay
+        """
+        return GraphView(self, writable, typ)
+
     def get_number_of_edges(self):
         return sum([self.matrices[label].nvals for label in self.matrices])
 
+    def to_internal(self, vertices) -> list:
+        """
+        Translate vertices ids of graph file into ids of matrices
+        """
+        if self.vertex_map is None:
+            return list(vertices)
+        return self.vertex_map.to_internal(list(vertices)).tolist()
+
+    def to_external(self, vertices) -> list:
+        """
+        Translate ids of matrices into vertices ids of graph file
+        """
+        if self.vertex_map is None:
+            return list(vertices)
+        return self.vertex_map.to_external(list(vertices)).tolist()
+
+    def to_external_edges(self, edges: np.ndarray) -> np.ndarray:
+        """
+        Translate array of edges of shape (number of edges, 2) into vertices ids of graph file
+        """
+        if self.vertex_map is None:
+            return edges
+        return self.vertex_map.to_external(edges.ravel()).reshape(edges.shape)
+
+    def to_external_matrix(self, m: Matrix) -> Matrix:
+        """
+        Translate result matrix into vertices ids of graph file
+        """
+        if self.vertex_map is None:
+            return m
+        return self.vertex_map.matrix_to_external(m)
+
+    def to_external_graph(self, g: LabelGraph) -> LabelGraph:
+        """
+        Translate result graph, for example sub-graph of paths, into vertices ids of graph file
+        """
+        if self.vertex_map is None:
+            return g
+        result = LabelGraph(self.vertex_map.external_size)
+        for label in g:
+            result[label] = self.vertex_map.matrix_to_external(g[label])
+        result.is_empty = g.is_empty
+        return result
+
     @classmethod
-    def from_txt(cls, path: Path):
+    def from_txt(cls, path: Path, use_cache=True, compact_ids=False, workers=1, inverse_suffix=None, cache_dir=None):
+        """
+        Create graph from file in format triplets, it is loaded by one of load_* methods
+        @param path: path to file
+        @param use_cache: flag to load graph from fresh binary cache if it exists
+        @param compact_ids: flag to renumber vertices used in file into dense range 0..n-1,
+        results of algorithms are translated back to the ids of file
+        @param workers: number of processes parsing the file
+        @param inverse_suffix: suffix of inverse labels, for example '_r', whose missing matrices are derived
+        as transposes on load, empty string disables it. If None it is taken from sidecar metadata,
+        by default derivation is disabled
+        @param cache_dir: directory of binary cache, by default the cache is next to the file
+        @return: initialized class
+        """
         graph = Graph()
         graph.path = path
+        graph.use_cache = use_cache
+        graph.cache_dir = cache_dir
+        graph.compact_ids = compact_ids
+        graph.workers = workers
+        if inverse_suffix is None:
+            inverse_suffix = read_graph_meta(path).get('inverse_suffix', INVERSE_SUFFIX)
+        graph.inverse_suffix = inverse_suffix
         return graph
 
-    def load_bool_graph(self, verbose=False):
-        self.type = BOOL
-        self.matrices_size = get_graph_size(self.path)
+    def save_cache(self):
+        """
+        Write binary cache of graph into cache_dir or next to the file, it is picked up by the next loads
+        """
+        edges, vertices, _ = self._parse_edges()
+        GraphCache(self.path, self.cache_dir).save(edges, vertices)
+
+    def _parse_edges(self, verbose=False, labels=None, with_vertex_ids=False):
+        if self.workers > 1:
+            return read_edges_by_label_parallel(self.path, self.workers, verbose, labels, with_vertex_ids)
+        return read_edges_by_label(self.path, verbose, labels, with_vertex_ids)
+
+    def _read_edges(self, verbose=False, labels=None):
+        cache = GraphCache(self.path, self.cache_dir)
+        if not self.use_cache or not cache.is_fresh():
+            if self.compact_ids:
+                return self._parse_edges(verbose, labels, with_vertex_ids=True)
+            return self._parse_edges(verbose, labels) + (None,)
+
+        edges, vertices = cache.load()
+        vertex_ids = None
+        if self.compact_ids:
+            vertex_ids = np.unique(np.concatenate([np.empty(0, dtype=np.int64)] +
+                                                  [ids for label in edges for ids in edges[label]]))
+        if labels is None:
+            return edges, vertices, 0, vertex_ids
+
+        skipped = sum([len(edges[label][0]) for label in edges if label not in labels])
+        return {label: edges[label] for label in edges if label in labels}, vertices, skipped, vertex_ids
+
+    def load_bool_graph(self, verbose=False, labels=None):
+        self._load(BOOL, lambda sources, destinations: [True] * len(sources), verbose, labels)
+
+    def load_save_middle_graph(self, verbose=False, labels=None):
+        self._load(SAVEMIDDLETYPE,
+                   lambda sources, destinations: [(v, to, v, 1, 1) for v, to in zip(sources, destinations)],
+                   verbose, labels)
+
+    def load_save_length_graph(self, verbose=False, labels=None):
+        self._load(SAVELENGTHTYPE,
+                   lambda sources, destinations: [(v, to, v, 1) for v, to in zip(sources, destinations)],
+                   verbose, labels)
 
-        with open(self.path, "r") as f:
-            for line in tqdm(f.readlines()) if verbose else f.readlines():
-                v, label, to = line.split()
-                v, to = int(v), int(to)
+    def _load(self, typ, values, verbose=False, labels=None):
+        """
+        Load graph building every label matrix with one bulk operation
+        @param typ: type of matrices elements
+        @param values: function that by lists of sources and destinations of edges returns elements values
+        @param verbose: flag to set the output of information on download
+        @param labels: labels used by the query, edges with other labels are skipped. All edges are loaded if None.
+        Every type has its own set of matrices and only labels not loaded yet with this type are read,
+        loaded matrices are never replaced, so one load serves many queries and their views.
+        Missing inverse labels are derived from their base labels, see get_inverse_base
+        """
+        labels = self.with_inverse_bases(labels)
+        matrices = self.matrices_by_type.setdefault(typ, dict())
+        loaded = self.loaded_labels.get(typ, set())
+        self.type = typ
+        self.matrices = matrices
+        if loaded is None or (labels is not None and loaded.issuperset(labels)):
+            return
 
-                if label not in self.matrices:
-                    self.matrices[label] = Matrix.sparse(self.type, self.matrices_size, self.matrices_size)
+        self.loaded_labels[typ] = None if labels is None else loaded.union(labels)
+        if labels is not None:
+            labels = set(labels).difference(loaded)
+        edges, matrices_size, self.skipped_edges, vertex_ids = self._read_edges(verbose, labels)
+        if verbose and labels is not None:
+            print(f'{self.skipped_edges} edges with labels not used by the query are skipped')
 
-                self.matrices[label][v, to] = True
+        # size and ids of vertices are the same for all labels, so they are set by the first load
+        if not self.is_loaded:
+            self.matrices_size = matrices_size
+            if self.compact_ids:
+                self.vertex_map = VertexMap(vertex_ids, matrices_size)
+                self.matrices_size = len(self.vertex_map)
+        if self.vertex_map is not None:
+            edges = {label: (self.vertex_map.to_internal(sources), self.vertex_map.to_internal(destinations))
+                     for label, (sources, destinations) in edges.items()}
 
-    def load_save_middle_graph(self, verbose=False):
-        self.type = SAVEMIDDLETYPE
-        self.matrices_size = get_graph_size(self.path)
+        for label, (sources, destinations) in edges.items():
+            if label not in matrices:
+                matrices[label] = build_matrix(typ, self.matrices_size, sources, destinations,
+                                               values(sources.tolist(), destinations.tolist()))
+        self.derive_inverse(matrices, typ, values, labels)
+        self.is_loaded = True
 
-        with open(self.path, "r") as f:
-            for line in tqdm(f.readlines()) if verbose else f.readlines():
-                v, label, to = line.split()
-                v, to = int(v), int(to)
+    def derive_inverse(self, matrices: dict, typ, values, labels=None):
+        """
+        Add inverse labels missing in the file by edges of base labels with swapped ends
+        @param matrices: loaded matrices of one type
+        @param typ: type of matrices elements
+        @param values: function that by lists of sources and destinations of edges returns elements values
+        @param labels: requested labels, if None inverse labels of all base labels are derived
+        """
+        if not self.inverse_suffix:
+            return
+        if labels is None:
+            labels = [label + self.inverse_suffix for label in matrices if self.get_inverse_base(label) is None]
+        for label in labels:
+            base = self.get_inverse_base(label)
+            if label in matrices or base not in matrices:
+                continue
+            if typ == BOOL:
+                matrices[label] = matrices[base].transpose()
+            else:
+                # elements of index types store ends of their edge, so transpose would keep the ends of base edge
+                destinations, sources, _ = matrices[base].to_lists()
+                matrices[label] = build_matrix(typ, self.matrices_size, np.asarray(sources, dtype=np.int64),
+                                               np.asarray(destinations, dtype=np.int64),
+                                               values(sources, destinations))
 
-                if label not in self.matrices:
-                    self.matrices[label] = Matrix.sparse(self.type, self.matrices_size, self.matrices_size)
 
-                self.matrices[label][v, to] = (v, to, v, 1, 1)
+class GraphView(MatrixContainer):
+    """
+    Per-query overlay over read-only loaded Graph. Matrices of writable labels are kept in the overlay
+    and are copied from the graph on first access, other matrices are read from the matrices of the graph
+    with the type of the view. So one loaded graph can be shared between algorithms, grammars and
+    concurrent queries, even if later queries load it with other types or labels
+    """
+
+    def __init__(self, graph: Graph, writable=(), typ=None):
+        super().__init__(graph.type if typ is None else typ, graph.matrices_size)
+        self.graph = graph
+        self.writable = set(writable)
+
+    def __getitem__(self, item: str) -> Matrix:
+        if item in self.writable:
+            return self.allocate(item)
+        m = self.graph.get_matrix(item, self.type)
+        return self.empty() if m is None else m
+
+    def get_graph_matrices(self) -> dict:
+        return self.graph.matrices_by_type.get(self.type, dict())
+
+    def __setitem__(self, key, value):
+        self.writable.add(key)
+        super().__setitem__(key, value)
+
+    def __iter__(self):
+        return iter(set(self.get_graph_matrices()).union(self.matrices))
+
+    def __contains__(self, item):
+        return item in self.matrices or item in self.get_graph_matrices()
+
+    def allocate(self, item: str) -> Matrix:
+        """
+        Get matrix of label in the overlay for writing, it is copied from the graph on first access
+        """
+        self.writable.add(item)
+        if item not in self.matrices:
+            m = self.graph.get_matrix(item, self.type)
+            if m is not None and m.nvals != 0:
+                self.matrices[item] = m.dup()
+        return super().allocate(item)
+
+    def get_number_of_vertices(self):
+        return self.matrices_size
+
+    def get_number_of_edges(self):
+        return sum([self[label].nvals for label in self])
+
+    def to_internal(self, vertices) -> list:
+        return self.graph.to_internal(vertices)
 
-    def load_save_length_graph(self, verbose=False):
-        self.type = SAVELENGTHTYPE
-        self.matrices_size = get_graph_size(self.path)
+    def to_external(self, vertices) -> list:
+        return self.graph.to_external(vertices)
 
-        with open(self.path, "r") as f:
-            for line in tqdm(f.readlines()) if verbose else f.readlines():
-                v, label, to = line.split()
-                v, to = int(v), int(to)
+    def to_external_edges(self, edges: np.ndarray) -> np.ndarray:
+        return self.graph.to_external_edges(edges)
 
-                if label not in self.matrices:
-                    self.matrices[label] = Matrix.sparse(self.type, self.matrices_size, self.matrices_size)
+    def to_external_matrix(self, m: Matrix) -> Matrix:
+        return self.graph.to_external_matrix(m)
 
-                self.matrices[label][v, to] = (v, to, v, 1)
+    def to_external_graph(self, g: LabelGraph) -> LabelGraph:
+        return self.graph.to_external_graph(g)
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from src.graph.graph_meta import read_graph_meta
+
+CACHE_VERSION = 1
+HASH_BLOCK_SIZE = 1 << 24
+
+
+def get_file_hash(path) -> str:
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class GraphCache:
+    """
+    Binary cache of graph in format triplets stored next to it: graph_1.txt -> graph_1.cache/,
+    or in the given directory: cache_dir/graph_1.cache/. The cache contains meta.json (number of vertices, labels and information about the source file)
+    and COO arrays sorted by rows for every label, which are opened with numpy.memmap
+    """
+
+    def __init__(self, path, cache_dir=None):
+        self.path = Path(path)
+        if cache_dir is None:
+            self.cache_dir = self.path.with_suffix('.cache')
+        else:
+            self.cache_dir = Path(cache_dir).joinpath(self.path.stem + '.cache')
+        self.meta_path = self.cache_dir.joinpath('meta.json')
+
+    def exists(self):
+        return self.meta_path.is_file()
+
+    def read_meta(self) -> dict:
+        with open(self.meta_path, 'r') as f:
+            return json.load(f)
+
+    def is_fresh(self) -> bool:
+        """
+        Cache is fresh if the source file has the same size and either the same mtime or the same content hash,
+        and the number of vertices declared by sidecar metadata has not changed
+        @return: can the cache be used instead of the source file
+        """
+        if not self.exists() or not self.path.is_file():
+            return False
+
+        meta = self.read_meta()
+        stat = os.stat(self.path)
+        if meta.get('version') != CACHE_VERSION or meta['source_size'] != stat.st_size:
+            return False
+
+        if meta['declared_vertices'] != read_graph_meta(self.path).get('vertices'):
+            return False
+
+        return meta['source_mtime'] == stat.st_mtime_ns or meta['source_hash'] == get_file_hash(self.path)
+
+    def load(self) -> Tuple[Dict[str, Tuple[np.ndarray, np.ndarray]], int]:
+        """
+        Open cached graph, arrays are memory-mapped
+        @return: dictionary in format {label: (sources, destinations)} and number of vertices
+        """
+        meta = self.read_meta()
+        edges = dict()
+        for i, label in enumerate(meta['labels']):
+            edges[label] = (np.load(self.cache_dir.joinpath(f'rows_{i}.npy'), mmap_mode='r'),
+                            np.load(self.cache_dir.joinpath(f'cols_{i}.npy'), mmap_mode='r'))
+        return edges, meta['vertices']
+
+    def save(self, edges: Dict[str, Tuple[np.ndarray, np.ndarray]], vertices: int):
+        """
+        Write cache for graph
+        @param edges: dictionary in format {label: (sources, destinations)}
+        @param vertices: number of vertices
+        """
+        self.clear()
+        self.cache_dir.mkdir(parents=True)
+
+        stat = os.stat(self.path)
+        labels = list(edges)
+        for i, label in enumerate(labels):
+            sources, destinations = edges[label]
+            np.save(self.cache_dir.joinpath(f'rows_{i}.npy'), np.asarray(sources, dtype=np.int64))
+            np.save(self.cache_dir.joinpath(f'cols_{i}.npy'), np.asarray(destinations, dtype=np.int64))
+
+        # meta.json is written last, so a partially written cache is never used
+        with open(self.meta_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION,
+                       'vertices': int(vertices),
+                       'declared_vertices': read_graph_meta(self.path).get('vertices'),
+                       'labels': labels,
+                       'source_size': stat.st_size,
+                       'source_mtime': stat.st_mtime_ns,
+                       'source_hash': get_file_hash(self.path)}, f)
+
+    def clear(self):
+        if self.cache_dir.is_dir():
+            shutil.rmtree(self.cache_dir)
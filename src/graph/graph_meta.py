@@ -0,0 +1,34 @@
+import json
+from pathlib import Path
+
+
+def get_meta_path(path) -> Path:
+    """
+    Sidecar metadata of graph is stored next to it: graph_1.txt -> graph_1.meta
+    @param path: path to file with graph
+    @return: path to file with metadata
+    """
+    return Path(path).with_suffix('.meta')
+
+
+def read_graph_meta(path) -> dict:
+    """
+    Load sidecar metadata of graph, for example {"vertices": 100}
+    @param path: path to file with graph
+    @return: dictionary with metadata, empty if there is no metadata
+    """
+    meta_path = get_meta_path(path)
+    if not meta_path.is_file():
+        return dict()
+    with open(meta_path, 'r') as f:
+        return json.load(f)
+
+
+def write_graph_meta(path, **meta):
+    """
+    Save sidecar metadata of graph
+    @param path: path to file with graph
+    @param meta: metadata values, for example vertices=100
+    """
+    with open(get_meta_path(path), 'w') as f:
+        json.dump(meta, f)
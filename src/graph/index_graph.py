@@ -1,6 +1,8 @@
-from pygraphblas import Matrix
 from pygraphblas.types import Type, binop
 
+from src.graph.matrix_container import MatrixContainer
+from src.graph.triplets import read_edges_by_label, build_matrix
+
 MAX_MATRIX_SIZE = 10000000
 
 
@@ -62,28 +64,15 @@ class SAVEMIDDLETYPE(Type):
             z.length = 0
 
 
-class IndexGraph:
+class IndexGraph(MatrixContainer):
     def __init__(self, matrices_size=MAX_MATRIX_SIZE):
-        self.matrices = {}
-        self.matrices_size = matrices_size
-
-    def __getitem__(self, item: str) -> Matrix:
-        if item not in self.matrices:
-            self.matrices[item] = Matrix.sparse(SAVEMIDDLETYPE, self.matrices_size, self.matrices_size)
-        return self.matrices[item]
-
-    def __setitem__(self, key, value):
-        self.matrices[key] = value
-
-    def __iter__(self):
-        return self.matrices.__iter__()
+        super().__init__(SAVEMIDDLETYPE, matrices_size)
 
     @classmethod
     def from_txt(cls, path):
         g = IndexGraph()
-        with open(path, 'r') as f:
-            for line in f.readlines():
-                v, label, to = line.split()
-                v, to = int(v), int(to)
-                g[label][v, to] = (v, to, v, 1, 1)
+        edges, _, _ = read_edges_by_label(path)
+        for label, (sources, destinations) in edges.items():
+            g[label] = build_matrix(SAVEMIDDLETYPE, g.matrices_size, sources, destinations,
+                                    [(v, to, v, 1, 1) for v, to in zip(sources.tolist(), destinations.tolist())])
         return g
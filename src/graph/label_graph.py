@@ -1,33 +1,28 @@
 from pygraphblas.matrix import Matrix
 from pygraphblas.types import BOOL
-from tqdm import tqdm
 
+from src.graph.matrix_container import MatrixContainer
+from src.graph.triplets import read_edges_by_label, build_matrix
 from src.utils.common import chunkify
-from src.utils.graph_size import get_graph_size
 
 MAX_MATRIX_SIZE = 1000000
 
 
-class LabelGraph:
+class LabelGraph(MatrixContainer):
     """
     This class representing label directed graph. supports only the functions necessary for the algorithms to work
     """
     def __init__(self, matrices_size=MAX_MATRIX_SIZE):
-        self.matrices = {}
-        self.matrices_size = matrices_size
+        super().__init__(BOOL, matrices_size)
         self.is_empty = True
 
-    def __getitem__(self, item: str) -> Matrix:
-        if item not in self.matrices:
-            self.matrices[item] = Matrix.sparse(BOOL, self.matrices_size, self.matrices_size)
-        return self.matrices[item]
-
     def __setitem__(self, key, value):
         self.is_empty = False
-        self.matrices[key] = value
+        super().__setitem__(key, value)
 
-    def __iter__(self):
-        return self.matrices.__iter__()
+    def allocate(self, item: str) -> Matrix:
+        self.is_empty = False
+        return super().allocate(item)
 
     def get_number_of_vertices(self):
         return self.matrices_size
@@ -49,12 +44,10 @@ class LabelGraph:
         @param verbose: flag to set the output of information on download
         @return: initialized class
         """
-        g = LabelGraph(get_graph_size(path))
-        with open(path, 'r') as f:
-            for line in tqdm(f.readlines()) if verbose else f.readlines():
-                v, label, to = line.split()
-                v, to = int(v), int(to)
-                g[label][v, to] = True
+        edges, size, _ = read_edges_by_label(path, verbose)
+        g = LabelGraph(size)
+        for label, (sources, destinations) in edges.items():
+            g[label] = build_matrix(BOOL, g.matrices_size, sources, destinations, [True] * len(sources))
         return g
 
     def chunkify(self, chunk_len) -> list:
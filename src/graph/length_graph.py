@@ -1,9 +1,10 @@
 from pygraphblas import *
-from pygraphblas import Matrix
 from pygraphblas.types import Type, binop
-from pygraphblas.types import BOOL
 import numpy as np
 
+from src.graph.matrix_container import MatrixContainer
+from src.graph.triplets import read_edges_by_label, build_matrix
+
 MAX_MATRIX_SIZE = 10000000
 UINT32_MAX = np.iinfo(np.uint32).max
 
@@ -59,6 +60,19 @@ class SAVELENGTHTYPE(Type):
             z.middle = 0
             z.length = MAX_MATRIX_SIZE
 
+    @binop()
+    def SHORTER(z, x, y):
+        if x.length < y.length:
+            z.left = x.left
+            z.right = x.right
+            z.middle = x.middle
+            z.length = x.length
+        else:
+            z.left = 0
+            z.right = 0
+            z.middle = 0
+            z.length = 0   # for nonzero() function and GxB_NONZERO select operator
+
     @binop()
     def SUBTRACTION(z, x, y):
         if x.left == y.left and x.right == y.right and x.middle == y.middle and x.length == y.length:
@@ -73,28 +87,15 @@ class SAVELENGTHTYPE(Type):
             z.length = UINT32_MAX
 
 
-class LengthGraph:
+class LengthGraph(MatrixContainer):
     def __init__(self, matrices_size=MAX_MATRIX_SIZE):
-        self.matrices = {}
-        self.matrices_size = matrices_size
-
-    def __getitem__(self, item: str) -> Matrix:
-        if item not in self.matrices:
-            self.matrices[item] = Matrix.sparse(SAVELENGTHTYPE, self.matrices_size, self.matrices_size)
-        return self.matrices[item]
-
-    def __setitem__(self, key, value):
-        self.matrices[key] = value
-
-    def __iter__(self):
-        return self.matrices.__iter__()
+        super().__init__(SAVELENGTHTYPE, matrices_size)
 
     @classmethod
     def from_txt(cls, path):
         g = LengthGraph()
-        with open(path, 'r') as f:
-            for line in f.readlines():
-                v, label, to = line.split()
-                v, to = int(v), int(to)
-                g[label][v, to] = (v, to, v, 1)
+        edges, _, _ = read_edges_by_label(path)
+        for label, (sources, destinations) in edges.items():
+            g[label] = build_matrix(SAVELENGTHTYPE, g.matrices_size, sources, destinations,
+                                    [(v, to, v, 1) for v, to in zip(sources.tolist(), destinations.tolist())])
         return g
@@ -0,0 +1,149 @@
+from pygraphblas import Matrix
+
+
+class EmptyMatrix(Matrix):
+    """
+    Empty matrix shared by MatrixContainer for reads of missing labels. The shared instance is never changed:
+    in-place operators return a new matrix, so `container[label] += m` stores the new matrix in the container,
+    writing elements, assignments, resizing and operations with the shared matrix as `out` are errors
+    """
+    read_only = False
+
+    @classmethod
+    def shared(cls, typ, size):
+        m = cls.sparse(typ, size, size)
+        m.read_only = True
+        return m
+
+    def check_writable(self):
+        if self.read_only:
+            raise TypeError('Matrix of missing label is read-only, use MatrixContainer.allocate to write elements')
+
+    def __setitem__(self, index, value):
+        self.check_writable()
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index):
+        self.check_writable()
+        super().__delitem__(index)
+
+    def resize(self, *args, **kwargs):
+        self.check_writable()
+        super().resize(*args, **kwargs)
+
+    def clear(self):
+        if not self.read_only:
+            super().clear()
+
+
+def in_place_operator(name):
+    def operator(self, other):
+        if not self.read_only:
+            return getattr(Matrix, name)(self, other)
+        return getattr(Matrix, name)(Matrix.sparse(self.type, self.nrows, self.ncols), other)
+    return operator
+
+
+def assigning_method(name):
+    def method(self, *args, **kwargs):
+        self.check_writable()
+        return getattr(Matrix, name)(self, *args, **kwargs)
+    return method
+
+
+def writing_method(name):
+    def method(self, *args, **kwargs):
+        if kwargs.get('out') is self:
+            self.check_writable()
+        return getattr(Matrix, name)(self, *args, **kwargs)
+    return method
+
+
+for name in ['__iadd__', '__isub__', '__imul__', '__itruediv__', '__iand__', '__ior__', '__imatmul__']:
+    setattr(EmptyMatrix, name, in_place_operator(name))
+
+for name in ['assign_col', 'assign_row', 'assign_matrix', 'assign_scalar']:
+    setattr(EmptyMatrix, name, assigning_method(name))
+
+for name in ['pattern', 'transpose', 'cast', 'eadd', 'emult', 'apply', 'apply_first', 'apply_second', 'select',
+             'mxm', 'kronecker', 'extract_matrix']:
+    setattr(EmptyMatrix, name, writing_method(name))
+
+
+class MatrixContainer:
+    """
+    Square matrices of the same type and size indexed by labels.
+    Reading a missing label returns a cached read-only empty matrix and does not allocate,
+    matrices are stored only on write
+    """
+
+    def __init__(self, typ=None, matrices_size=0):
+        self.type = typ
+        self.matrices_size = matrices_size
+        self.matrices = dict()
+        self._empty = None
+
+    def __getitem__(self, item: str) -> Matrix:
+        if item in self.matrices:
+            return self.matrices[item]
+        return self.empty()
+
+    def __setitem__(self, key, value):
+        if isinstance(value, EmptyMatrix) and value.read_only:
+            value = Matrix.sparse(value.type, value.nrows, value.ncols)
+        self.matrices[key] = value
+
+    def __iter__(self):
+        return self.matrices.__iter__()
+
+    def __contains__(self, item):
+        return item in self.matrices
+
+    def empty(self) -> Matrix:
+        """
+        @return: cached read-only empty matrix of the container type and size
+        """
+        if self._empty is None or self._empty.type != self.type or self._empty.nrows != self.matrices_size:
+            self._empty = EmptyMatrix.shared(self.type, self.matrices_size)
+        elif self._empty.nvals != 0:
+            # operation of other matrix wrote into the shared matrix as its out
+            self._empty = None
+            raise TypeError('Matrix of missing label is changed, use MatrixContainer.allocate to write elements')
+        return self._empty
+
+    def get_nonempty(self, labels) -> set:
+        """
+        @param labels: labels to check
+        @return: labels whose matrices have elements
+        """
+        return {label for label in labels if self[label].nvals != 0}
+
+    def element_bytes(self) -> int:
+        """
+        @return: size in bytes of the values stored in matrices, number of elements times size of the type,
+        it does not depend on other allocations of the process
+        """
+        size = self.type._ffi.sizeof(self.type._c_type)
+        return sum(m.nvals for m in self.matrices.values()) * size
+
+    def allocate(self, item: str) -> Matrix:
+        """
+        Get matrix of label for writing its elements, the matrix is created if it is missing
+        @param item: label
+        @return: stored matrix
+        """
+        if item not in self.matrices:
+            self.matrices[item] = Matrix.sparse(self.type, self.matrices_size, self.matrices_size)
+        return self.matrices[item]
+
+    def prune(self, used=None) -> list:
+        """
+        Free empty matrices and matrices of labels that are not used anymore, for example after a solve
+        @param used: labels to keep if they are not empty, all labels are kept if None
+        @return: list of freed labels
+        """
+        freed = [label for label in self.matrices
+                 if self.matrices[label].nvals == 0 or (used is not None and label not in used)]
+        for label in freed:
+            del self.matrices[label]
+        return freed
@@ -0,0 +1,90 @@
+from pygraphblas import Matrix
+from pygraphblas.types import UINT64
+
+from src.graph.matrix_container import MatrixContainer
+
+"""
+Index element is packed into uint64: key (height or length of path) in the high 32 bits and middle vertex
+in the low 32 bits, so the minimum of packed values is the element with the minimal key
+"""
+KEY_SHIFT = 32
+MIDDLE_MASK = (1 << KEY_SHIFT) - 1
+KEY_MASK = ((1 << 64) - 1) ^ MIDDLE_MASK
+
+
+def pack(key: int, middle: int) -> int:
+    return (key << KEY_SHIFT) | middle
+
+
+def unpack(value: int) -> tuple:
+    """
+    @return: pair (key, middle)
+    """
+    return value >> KEY_SHIFT, value & MIDDLE_MASK
+
+
+def keys(m: Matrix) -> Matrix:
+    """
+    @return: matrix with keys of elements of m and zero middles
+    """
+    return m.apply_second(UINT64.BAND, KEY_MASK)
+
+
+class PackedIndexGraph(MatrixContainer):
+    """
+    Index of single path algorithms with elements packed into uint64, see pack. Products are computed
+    by built-in semirings: middle vertex k of product of (i, k) and (k, j) is added to elements
+    by multiplication by diagonal matrix {(k, k): k}, and the minimum is taken by MIN monoid
+    """
+
+    def __init__(self, matrices_size: int):
+        """
+        @param matrices_size: number of graph vertices, the diagonal of middles is built for them
+        """
+        super().__init__(UINT64, matrices_size)
+        vertices = list(range(matrices_size))
+        self.middles = Matrix.from_lists(vertices, vertices, vertices, nrows=matrices_size, ncols=matrices_size,
+                                         typ=UINT64)
+
+    def from_edges(self, m: Matrix) -> Matrix:
+        """
+        @param m: boolean matrix of edges
+        @return: index of edges, key is one and middle is the source of edge
+        """
+        terminals = self.middles.apply_second(UINT64.PLUS, pack(1, 0))
+        return terminals.mxm(m, semiring=UINT64.MIN_FIRST)
+
+    def tag_rows(self, m: Matrix) -> Matrix:
+        """
+        @return: keys of elements of m with the row of element as middle
+        """
+        return self.middles.mxm(keys(m), semiring=UINT64.MIN_PLUS)
+
+    def tag_columns(self, m: Matrix) -> Matrix:
+        """
+        @return: keys of elements of m with the column of element as middle
+        """
+        return keys(m).mxm(self.middles, semiring=UINT64.MIN_PLUS)
+
+    def shortest_product(self, a: Matrix, b: Matrix) -> Matrix:
+        """
+        @return: {(i, j): min over k of (length(a[i, k]) + length(b[k, j]), k)}
+        """
+        return keys(a).mxm(self.tag_rows(b), semiring=UINT64.MIN_PLUS)
+
+    def single_product(self, a: Matrix, b: Matrix) -> Matrix:
+        """
+        @return: {(i, j): min over k of (max(height(a[i, k]), height(b[k, j])) + 1, k)}
+        """
+        product = self.tag_columns(a).mxm(self.tag_rows(b), semiring=UINT64.MIN_MAX)
+        return product.apply_second(UINT64.PLUS, pack(1, 0))
+
+    def update(self, label: str, m: Matrix) -> bool:
+        """
+        Take minimum of index of label and m
+        @return: whether index of label is changed: m has pairs not in index or smaller elements
+        """
+        old = self[label]
+        improved = m.emult(old, UINT64.LT).nonzero().nvals
+        self[label] = old.eadd(m, add_op=UINT64.MIN)
+        return improved != 0 or self[label].nvals != old.nvals
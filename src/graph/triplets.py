@@ -0,0 +1,285 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+from tqdm import tqdm
+
+from pygraphblas import Matrix
+
+from src.graph.graph_meta import read_graph_meta
+
+
+CHUNK_SIZE = 1 << 24
+RANGE_SIZE = 1 << 26
+
+
+class ParsedChunk:
+    """
+    Edges of a part of file in format triplets
+    """
+
+    def __init__(self, sources, destinations, labels, label_ids, max_vertex=-1, skipped=0, vertex_ids=None):
+        """
+        @param sources: sources of kept edges
+        @param destinations: destinations of kept edges
+        @param labels: list of distinct labels of the part
+        @param label_ids: for every kept edge index of its label in labels
+        @param max_vertex: max vertex id among all edges of the part
+        @param skipped: number of skipped lines
+        @param vertex_ids: sorted ids of vertices of all edges of the part if they are requested
+        """
+        self.sources = sources
+        self.destinations = destinations
+        self.labels = labels
+        self.label_ids = label_ids
+        self.max_vertex = max_vertex
+        self.skipped = skipped
+        self.vertex_ids = vertex_ids
+
+
+def read_edges_by_label(path, verbose=False, labels=None, with_vertex_ids=False):
+    """
+    Parse file in format triplets into NumPy arrays with one streaming pass and group edges by label.
+    Number of vertices is taken from sidecar metadata if it exists, otherwise it is the max vertex id + 1
+    @param path: path to file with graph
+    @param verbose: flag to set the output of information on download
+    @param labels: labels of edges to keep, edges with other labels are skipped. All edges are kept if None
+    @param with_vertex_ids: flag to additionally return sorted ids of vertices of all edges, including skipped ones
+    @return: dictionary in format {label: (sources, destinations)} without duplicate edges, number of vertices
+    and number of skipped lines
+    """
+    with open(path, 'r') as f:
+        chunks = iter(lambda: f.readlines(CHUNK_SIZE), [])
+        parsed = [parse_chunk(path, lines, labels, with_vertex_ids) for lines in (tqdm(chunks) if verbose else chunks)]
+    return merge_chunks(path, parsed, with_vertex_ids)
+
+
+def parse_chunk(path, lines, labels=None, with_vertex_ids=False) -> ParsedChunk:
+    """
+    Parse lines of file in format triplets and skip edges with labels not in labels
+    """
+    sources, chunk_labels, destinations = parse_lines(path, lines)
+    if len(sources) == 0:
+        return ParsedChunk(sources, destinations, [], np.empty(0, dtype=np.int64))
+
+    max_vertex = int(max(sources.max(), destinations.max()))
+    vertex_ids = np.unique(np.concatenate([sources, destinations])) if with_vertex_ids else None
+
+    chunk_labels, label_ids = np.unique(chunk_labels, return_inverse=True)
+    skipped = 0
+    if labels is not None:
+        is_kept = np.array([str(label) in labels for label in chunk_labels], dtype=bool)[label_ids]
+        skipped = len(is_kept) - int(is_kept.sum())
+        sources, destinations, label_ids = sources[is_kept], destinations[is_kept], label_ids[is_kept]
+
+    return ParsedChunk(sources, destinations, [str(label) for label in chunk_labels], label_ids,
+                       max_vertex, skipped, vertex_ids)
+
+
+def merge_chunks(path, chunks, with_vertex_ids=False):
+    """
+    Merge parsed parts of file in format triplets, see read_edges_by_label
+    """
+    label_index = dict()
+    chunks_label_ids = [np.empty(0, dtype=np.int64)]
+    for chunk in chunks:
+        to_global = np.array([label_index.setdefault(label, len(label_index)) for label in chunk.labels], dtype=np.int64)
+        chunks_label_ids.append(to_global[chunk.label_ids])
+
+    number_of_vertices = get_number_of_vertices(path, max([chunk.max_vertex for chunk in chunks], default=-1))
+    skipped = sum([chunk.skipped for chunk in chunks])
+
+    edges = dict()
+    if len(label_index) != 0:
+        edges = group_by_label(np.concatenate([chunk.sources for chunk in chunks]),
+                               np.concatenate([chunk.destinations for chunk in chunks]),
+                               np.array(list(label_index)),
+                               np.concatenate(chunks_label_ids))
+        edges = {label: edges[label] for label in edges if len(edges[label][0]) > 0}
+
+    if with_vertex_ids:
+        vertex_ids = [np.empty(0, dtype=np.int64)] + [chunk.vertex_ids for chunk in chunks if chunk.vertex_ids is not None]
+        return edges, number_of_vertices, skipped, np.unique(np.concatenate(vertex_ids))
+    return edges, number_of_vertices, skipped
+
+
+def read_edges_by_label_parallel(path, workers: int, verbose=False, labels=None, with_vertex_ids=False):
+    """
+    Parse file in format triplets in parallel: the file is split into byte ranges on line boundaries,
+    ranges are parsed in worker processes and arrays are returned through shared memory.
+    Result is the same as read_edges_by_label
+    @param path: path to file with graph
+    @param workers: number of worker processes
+    @param verbose: flag to set the output of information on download
+    @param labels: labels of edges to keep, edges with other labels are skipped. All edges are kept if None
+    @param with_vertex_ids: flag to additionally return sorted ids of vertices of all edges, including skipped ones
+    """
+    ranges = split_into_ranges(path, max(workers, os.path.getsize(path) // RANGE_SIZE))
+
+    # workers register their blocks in the resource tracker of this process,
+    # so the blocks left after failure of this process are unlinked by the tracker
+    resource_tracker.ensure_running()
+    parsed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_range, path, start, end, labels, with_vertex_ids) for start, end in ranges]
+        try:
+            for future in tqdm(futures) if verbose else futures:
+                parsed.append(SharedChunk.load(future.result()))
+        finally:
+            # blocks of chunks that are not loaded because of error are released
+            for future in futures[len(parsed):]:
+                if not future.cancel() and future.exception() is None:
+                    SharedChunk.release(future.result())
+    return merge_chunks(path, parsed, with_vertex_ids)
+
+
+def split_into_ranges(path, count: int):
+    """
+    Split file into at most count byte ranges, every range ends at the end of line
+    @return: list of pairs (start, end)
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, count):
+            if size * i // count <= bounds[-1]:
+                continue
+            f.seek(size * i // count)
+            f.readline()
+            if f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def parse_range(path, start: int, end: int, labels=None, with_vertex_ids=False):
+    """
+    Parse byte range of file in format triplets in worker process
+    @return: description of chunk placed in shared memory
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    return SharedChunk.store(parse_chunk(path, [text], labels, with_vertex_ids))
+
+
+class SharedChunk:
+    """
+    Transfer of ParsedChunk arrays between processes through one block of shared memory
+    """
+    ARRAYS = ['sources', 'destinations', 'label_ids', 'vertex_ids']
+
+    @staticmethod
+    def store(chunk: ParsedChunk) -> dict:
+        arrays = {name: np.asarray(getattr(chunk, name), dtype=np.int64) for name in SharedChunk.ARRAYS
+                  if getattr(chunk, name) is not None}
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum([a.nbytes for a in arrays.values()])))
+
+        offset = 0
+        layout = dict()
+        try:
+            for name, array in arrays.items():
+                np.ndarray(array.shape, dtype=np.int64, buffer=shm.buf, offset=offset)[:] = array
+                layout[name] = (offset, len(array))
+                offset += array.nbytes
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        # the block is unlinked by the receiving process
+        shm.close()
+
+        return {'name': shm.name, 'layout': layout, 'labels': chunk.labels,
+                'max_vertex': chunk.max_vertex, 'skipped': chunk.skipped}
+
+    @staticmethod
+    def load(description: dict) -> ParsedChunk:
+        shm = shared_memory.SharedMemory(name=description['name'])
+        arrays = dict.fromkeys(SharedChunk.ARRAYS)
+        try:
+            for name, (offset, length) in description['layout'].items():
+                arrays[name] = np.ndarray((length,), dtype=np.int64, buffer=shm.buf, offset=offset).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return ParsedChunk(arrays['sources'], arrays['destinations'], description['labels'], arrays['label_ids'],
+                           description['max_vertex'], description['skipped'], arrays['vertex_ids'])
+
+    @staticmethod
+    def release(description: dict):
+        """
+        Unlink block of chunk without reading it
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=description['name'])
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def parse_lines(path, lines):
+    """
+    Parse lines of file in format triplets
+    @param path: path to file with graph, used in error message
+    @param lines: list of lines
+    @return: arrays of sources, labels and destinations
+    """
+    tokens = ' '.join(lines).split()
+
+    if len(tokens) % 3 != 0:
+        raise Exception(f'{path} is not in format triplets: "vertex label vertex" is expected on every line')
+
+    sources = np.asarray(tokens[0::3]).astype(np.int64)
+    destinations = np.asarray(tokens[2::3]).astype(np.int64)
+    return sources, np.asarray(tokens[1::3]), destinations
+
+
+def get_number_of_vertices(path, max_vertex: int) -> int:
+    """
+    Number of vertices given by sidecar metadata or found from the loaded edges
+    @param path: path to file with graph
+    @param max_vertex: max vertex id in the loaded edges
+    @return: number of vertices
+    """
+    meta = read_graph_meta(path)
+    if 'vertices' not in meta:
+        return int(max_vertex) + 1
+
+    if meta['vertices'] <= max_vertex:
+        raise Exception(f'Metadata of {path} declares {meta["vertices"]} vertices, but vertex {max_vertex} is found')
+    return meta['vertices']
+
+
+def group_by_label(sources: np.ndarray, destinations: np.ndarray, labels: np.ndarray, label_ids: np.ndarray):
+    """
+    Split edges given by parallel arrays into per label arrays
+    @param sources: sources of edges
+    @param destinations: destinations of edges
+    @param labels: array of distinct labels
+    @param label_ids: for every edge index of its label in labels
+    @return: dictionary in format {label: (sources, destinations)} without duplicate edges
+    """
+    order = np.argsort(label_ids, kind='stable')
+    bounds = np.cumsum(np.bincount(label_ids, minlength=len(labels)))[:-1]
+
+    edges = dict()
+    for label, part in zip(labels, np.split(order, bounds)):
+        pairs = np.unique(np.stack([sources[part], destinations[part]], axis=1), axis=0)
+        edges[str(label)] = (pairs[:, 0], pairs[:, 1])
+    return edges
+
+
+def build_matrix(typ, size: int, sources: np.ndarray, destinations: np.ndarray, values) -> Matrix:
+    """
+    Build square matrix with one bulk operation
+    @param typ: type of matrix elements
+    @param size: number of rows and columns
+    @param sources: row indices of elements
+    @param destinations: column indices of elements
+    @param values: list of elements values
+    @return: built matrix
+    """
+    return Matrix.from_lists(sources.tolist(), destinations.tolist(), values, nrows=size, ncols=size, typ=typ)
@@ -0,0 +1,43 @@
+import numpy as np
+
+from pygraphblas import Matrix
+
+
+class VertexMap:
+    """
+    Bidirectional map between external vertex ids of graph file and dense internal ids 0..n-1
+    """
+
+    def __init__(self, external_ids: np.ndarray, external_size: int):
+        """
+        @param external_ids: sorted distinct ids of vertices used in graph
+        @param external_size: number of vertices in external ids space
+        """
+        self.external_ids = external_ids
+        self.external_size = external_size
+
+    def __len__(self):
+        return len(self.external_ids)
+
+    def to_internal(self, vertices) -> np.ndarray:
+        vertices = np.asarray(vertices, dtype=np.int64)
+        internal = np.searchsorted(self.external_ids, vertices)
+        if np.any(internal >= len(self.external_ids)) or np.any(self.external_ids[internal] != vertices):
+            raise KeyError(f'Some of vertices {vertices} are not in graph')
+        return internal
+
+    def to_external(self, vertices) -> np.ndarray:
+        return self.external_ids[np.asarray(vertices, dtype=np.int64)]
+
+    def matrix_to_external(self, m: Matrix) -> Matrix:
+        """
+        Translate coordinates of matrix elements into external ids space
+        @param m: matrix with internal ids
+        @return: new matrix of size external_size
+        """
+        if m.nvals == 0:
+            return Matrix.sparse(m.type, self.external_size, self.external_size)
+
+        rows, cols, values = m.to_lists()
+        return Matrix.from_lists(self.to_external(rows).tolist(), self.to_external(cols).tolist(), values,
+                                 nrows=self.external_size, ncols=self.external_size, typ=m.type)
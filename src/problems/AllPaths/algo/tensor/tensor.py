@@ -1,12 +1,13 @@
 from pathlib import Path
 from cfpq_data import RSM
 from pyformlang.cfg import CFG
-from pygraphblas import Matrix, BOOL
+from pygraphblas import Matrix, BOOL, descriptor
 from src.graph.graph import Graph
 from typing import Iterable, Union
 
 from src.grammar.rsa import RecursiveAutomaton
-from src.graph.label_graph import LabelGraph
+from src.utils.closure import transitive_closure, update_closure
+from src.utils.diagonal import identity
 from src.problems.AllPaths.algo.tensor.tensor_path import TensorPathsNew
 from src.problems.AllPaths.algo.tensor.tensor_extract_subgraph import TensorExtractSubGraph
 
@@ -16,162 +17,307 @@ from src.problems.utils import ResultAlgo
 
 
 def restore_eps_paths(nonterminals: Iterable, graph: Graph):
+    eps = identity(graph.matrices_size)
     for label in nonterminals:
-        for i in range(graph.matrices_size):
-            graph[label][i, i] = True
-
-
-def transitive_closure(m: Matrix):
-    prev = m.nvals
-    degree = m
-    with BOOL.ANY_PAIR:
-        degree = degree @ m
-        m += degree
-    while prev != m.nvals:
-        prev = m.nvals
+        m = graph.allocate(label)
+        m += eps
+
+
+def difference(m: Matrix, known: Matrix) -> Matrix:
+    """
+    @return: new boolean matrix with elements of m that are not in known
+    """
+    return m.select('==', True, mask=known, desc=descriptor.C)
+
+
+class StateBlocks:
+    """
+    Selection of blocks (start state, final state) of matrix indexed by pairs (RSA state, vertex),
+    for example Kronecker product of RSA and graph. Blocks of all final states of nonterminal are selected
+    and summed by two multiplications by selection matrices, not by slicing every block separately
+    """
+
+    def __init__(self, grammar: RecursiveAutomaton, size: int):
+        """
+        @param grammar: RSA
+        @param size: number of graph vertices
+        """
+        self.selections = dict()
+        vertices = list(range(size))
+        kron_size = grammar.matrices_size * size
+        for nonterminal in grammar.nonterminals:
+            start = grammar.start_state[nonterminal] * size
+            # row selection (start, v) -> v
+            left = Matrix.from_lists(vertices, [start + v for v in vertices], [True] * size,
+                                     nrows=size, ncols=kron_size, typ=BOOL)
+            # column selection (final, v) -> v for all final states
+            finals = grammar.finish_states[nonterminal]
+            right = Matrix.from_lists([final * size + v for final in finals for v in vertices],
+                                      vertices * len(finals), [True] * (size * len(finals)),
+                                      nrows=kron_size, ncols=size, typ=BOOL)
+            self.selections[nonterminal] = (left, right)
+
+    def extract(self, m: Matrix, nonterminal: str) -> Matrix:
+        """
+        @return: sum of blocks (start state, final state) of nonterminal
+        """
+        left, right = self.selections[nonterminal]
         with BOOL.ANY_PAIR:
-            degree = degree @ m
-            m += degree
-
-
-class TensorSimpleAlgo(AllPathsProblem):
-
-    def prepare(self, graph: Graph, grammar: Union[RSM, CFG, Path]):
+            return left.mxm(m).mxm(right)
+
+    def update(self, graph: Graph, m: Matrix) -> dict:
+        """
+        Add blocks of all nonterminals to graph
+        @param graph: graph with nonterminal edges
+        @param m: matrix indexed by pairs (RSA state, vertex)
+        @return: new nonterminal edges in format {nonterminal: matrix}, nonterminals without new edges are skipped
+        """
+        new_edges = dict()
+        for nonterminal in self.selections:
+            new = difference(self.extract(m, nonterminal), graph[nonterminal])
+            if new.nvals != 0:
+                graph[nonterminal] += new
+                new_edges[nonterminal] = new
+        return new_edges
+
+
+class FullTensor:
+    """
+    Tensor algorithm that builds Kronecker product of RSA and graph and its transitive closure anew
+    on every iteration, until no new edges of nonterminals used in RSA transitions are found
+    """
+
+    def __init__(self, grammar: RecursiveAutomaton, graph: Graph):
+        self.grammar = grammar
         self.graph = graph
-        self.graph.load_bool_graph()
-        self.grammar = RecursiveAutomaton.from_grammar_or_path(grammar)
-
-    def solve(self):
-        restore_eps_paths(self.grammar.start_and_finish, self.graph)
-
-        sizeKron = self.graph.matrices_size * self.grammar.matrices_size
-
+        self.blocks = StateBlocks(grammar, graph.matrices_size)
+
+    def run(self) -> int:
+        """
+        Find nonterminal edges of graph until fixpoint
+        @return: number of iterations
+        """
+        size = self.graph.matrices_size * self.grammar.matrices_size
         iter = 0
         changed = True
         while changed:
             iter += 1
-            changed = False
-
-            kron = Matrix.sparse(BOOL, sizeKron, sizeKron)
+            kron = Matrix.sparse(BOOL, size, size)
             for label in self.grammar.labels:
                 kron += self.grammar[label].kronecker(self.graph[label])
-
             transitive_closure(kron)
 
-            # update
-            for nonterminal in self.grammar.nonterminals:
-                for element in self.grammar.states[nonterminal]:
-                    i = element[0]
-                    j = element[1]
-
-                    start_i = i * self.graph.matrices_size
-                    start_j = j * self.graph.matrices_size
-
-                    control_sum = self.graph[nonterminal].nvals
-                    block = kron[start_i:start_i + self.graph.matrices_size - 1,
-                                 start_j:start_j + self.graph.matrices_size - 1]
-
-                    self.graph[nonterminal] += block
-                    new_control_sum = self.graph[nonterminal].nvals
-
-                    if new_control_sum != control_sum:
-                        changed = True
-
-            if self.grammar.nonterminals.isdisjoint(self.grammar.labels):
-                break
-
-        return ResultAlgo(self.graph[self.grammar.start_nonterm], iter)
-
-    def prepare_for_solve(self):
-        for label in self.grammar.nonterminals:
-            self.graph[label].clear()
-
-    def prepare_for_exctract_paths(self):
-        sizeKron = self.graph.matrices_size * self.grammar.matrices_size
-        self.kron = Matrix.sparse(BOOL, sizeKron, sizeKron)
-        for label in self.grammar.labels:
-            self.kron += self.grammar[label].kronecker(self.graph[label])
-
-    def getPaths(self, v_start: int, v_finish: int, nonterminal: str, max_len: int):
-        return TensorPathsNew(self.graph, self.grammar, self.kron).get_paths(v_start, v_finish, nonterminal, max_len)
-
-    def get_sub_graph(self, v_start: int, v_finish: int, nonterminal: str, max_high: int):
-        return TensorExtractSubGraph(self.graph, self.grammar, self.kron, max_high).get_sub_graph(v_start,
-                                                                                                  v_finish,
-                                                                                                  nonterminal)
+            new_edges = self.blocks.update(self.graph, kron)
+            changed = any(label in self.grammar.labels for label in new_edges)
+        return iter
 
 
-class TensorDynamicAlgo(AllPathsProblem):
+class IncrementalTensor:
+    """
+    Tensor algorithm that keeps transitive closure of Kronecker product of RSA and graph between iterations.
+    Every iteration multiplies by RSA only nonterminal edges found on the previous iteration
+    and adds their product to the closure with update_closure
+    """
 
-    def prepare(self, graph: Graph, grammar: Union[RSM, CFG, Path]):
+    def __init__(self, grammar: RecursiveAutomaton, graph: Graph):
+        self.grammar = grammar
         self.graph = graph
-        self.graph.load_bool_graph()
-        self.grammar = RecursiveAutomaton.from_grammar_or_path(grammar)
-
-    def solve(self):
-        restore_eps_paths(self.grammar.start_and_finish, self.graph)
-
-        sizeKron = self.graph.matrices_size * self.grammar.matrices_size
-
-        prev_kron = Matrix.sparse(BOOL, sizeKron, sizeKron)
+        size = graph.matrices_size * grammar.matrices_size
+        self.closure = Matrix.sparse(BOOL, size, size)
+        self.blocks = StateBlocks(grammar, graph.matrices_size)
+
+    def run(self) -> int:
+        """
+        Find nonterminal edges of graph until fixpoint
+        @return: number of iterations
+        """
+        delta = {label: self.graph[label] for label in self.grammar.labels}
         iter = 0
-        block = LabelGraph(self.graph.matrices_size)
-        changed = True
-        first_iter = True
-        while changed:
-            changed = False
+        while len(delta) > 0:
             iter += 1
-
-            kron = Matrix.sparse(BOOL, sizeKron, sizeKron)
-
-            if first_iter:
-                for label in self.grammar.labels:
-                    kron += self.grammar[label].kronecker(self.graph[label])
-            else:
-                for nonterminal in block.matrices:
-                    kron += self.grammar[nonterminal].kronecker(block[nonterminal])
-                    block[nonterminal] = Matrix.sparse(BOOL, self.graph.matrices_size, self.graph.matrices_size)
-
-            transitive_closure(kron)
-
-            if not first_iter:
-                part = prev_kron.mxm(kron, semiring=BOOL.ANY_PAIR)
-                with BOOL.ANY_PAIR:
-                    kron += prev_kron + part @ prev_kron + part + kron @ prev_kron
-
-            prev_kron = kron
-
+            kron_delta = Matrix.sparse(BOOL, self.closure.nrows, self.closure.ncols)
+            for label, m in delta.items():
+                kron_delta += self.grammar[label].kronecker(m)
+            update_closure(self.closure, kron_delta)
+
+            new_edges = self.blocks.update(self.graph, self.closure)
+            delta = {label: m for label, m in new_edges.items() if label in self.grammar.labels}
+        return iter
+
+
+class ImplicitTensor:
+    """
+    Tensor algorithm that never builds Kronecker product of RSA and graph. The product is kept implicit:
+    block (s, q) of the closure is a graph-sized matrix of vertex pairs (u, v) such that vertex (q, v)
+    of the product is reachable from (s, u) by a non-empty path. Only rows of start states are computed,
+    and every RSA transition q -label-> q' extends block (s, q) to (s, q') by multiplication by graph[label]
+    """
+
+    def __init__(self, grammar: RecursiveAutomaton, graph: Graph):
+        self.grammar = grammar
+        self.graph = graph
+        self.starts = {grammar.start_state[nonterminal] for nonterminal in grammar.nonterminals}
+        self.blocks = dict()
+
+    def get_block(self, i: int, j: int) -> Matrix:
+        if (i, j) not in self.blocks:
+            self.blocks[(i, j)] = Matrix.sparse(BOOL, self.graph.matrices_size, self.graph.matrices_size)
+        return self.blocks[(i, j)]
+
+    def add_new(self, frontier: dict, start: int, state: int, m: Matrix):
+        """
+        Add to frontier entries of m that are not in block (start, state)
+        """
+        new = difference(m, self.get_block(start, state))
+        if new.nvals == 0:
+            return
+        if (start, state) in frontier:
+            frontier[(start, state)] += new
+        else:
+            frontier[(start, state)] = new
+
+    def propagate(self, frontier: dict) -> set:
+        """
+        Add frontier to blocks and extend it by all RSA transitions until no new entries are found
+        @param frontier: new entries of blocks in format {(start, state): matrix}
+        @return: changed blocks
+        """
+        changed = set()
+        while len(frontier) > 0:
+            for (start, state), m in frontier.items():
+                block = self.get_block(start, state)
+                block += m
+            changed.update(frontier.keys())
+
+            new_frontier = dict()
+            for (start, state), m in frontier.items():
+                for out, label in self.grammar.out_states.get(state, []):
+                    with BOOL.ANY_PAIR:
+                        product = m.mxm(self.graph[label], mask=self.get_block(start, out), desc=descriptor.C)
+                    self.add_new(new_frontier, start, out, product)
+            frontier = new_frontier
+        return changed
+
+    def run(self) -> int:
+        """
+        Find nonterminal edges of graph until fixpoint
+        @return: number of iterations
+        """
+        delta = {label: self.graph[label] for label in self.grammar.labels}
+        iter = 0
+        while len(delta) > 0:
+            iter += 1
+            # paths that start with new edge or extend known path by new edge
+            frontier = dict()
+            for start in self.starts:
+                for out, label in self.grammar.out_states.get(start, []):
+                    if label in delta:
+                        self.add_new(frontier, start, out, delta[label])
+            for (start, state), block in list(self.blocks.items()):
+                for out, label in self.grammar.out_states.get(state, []):
+                    if label in delta:
+                        with BOOL.ANY_PAIR:
+                            product = block.mxm(delta[label], mask=self.get_block(start, out), desc=descriptor.C)
+                        self.add_new(frontier, start, out, product)
+            changed = self.propagate(frontier)
+
+            # changed blocks of every nonterminal are summed and the graph is updated once per nonterminal
+            delta = dict()
             for nonterminal in self.grammar.nonterminals:
-                for element in self.grammar.states[nonterminal]:
-                    i = element[0]
-                    j = element[1]
-
-                    start_i = i * self.graph.matrices_size
-                    start_j = j * self.graph.matrices_size
-
-                    control_sum = self.graph[nonterminal].nvals
+                blocks = [self.blocks[pair] for pair in self.grammar.states[nonterminal] if pair in changed]
+                if len(blocks) == 0:
+                    continue
+                block = blocks[0].dup()
+                for m in blocks[1:]:
+                    block += m
+                new = difference(block, self.graph[nonterminal])
+                if new.nvals != 0:
+                    self.graph[nonterminal] += new
+                    if nonterminal in self.grammar.labels:
+                        delta[nonterminal] = new
+        return iter
+
+
+class RegularTensor:
+    """
+    Fast path for regular RSA, see RecursiveAutomaton.get_regular_order. Components of nonterminals are evaluated
+    once in order, tail calls inside a component are replaced by empty transitions into the start state
+    of the called box. So every box is a finite automaton over terminals and already evaluated nonterminals,
+    and its edges are found by one traversal of the product of the automaton and graph from all vertices
+    without the outer fixpoint
+    """
+
+    def __init__(self, grammar: RecursiveAutomaton, graph: Graph):
+        self.grammar = grammar
+        self.graph = graph
 
-                    if first_iter:
-                        block[nonterminal] += kron[start_i:start_i + self.graph.matrices_size - 1,
-                                                  start_j:start_j + self.graph.matrices_size - 1]
+    def reach(self, start: int, component: list) -> dict:
+        """
+        @return: {state: matrix of vertex pairs (u, v) such that (state, v) is reachable from (start, u)}
+        """
+        reached = {start: identity(self.graph.matrices_size)}
+        frontier = dict(reached)
+        while len(frontier) > 0:
+            new_frontier = dict()
+            for state, m in frontier.items():
+                for to, label in self.grammar.out_states.get(state, []):
+                    if label in component:
+                        to, product = self.grammar.start_state[label], m
                     else:
-                        new_edges = kron[start_i:start_i + self.graph.matrices_size - 1,
-                                         start_j:start_j + self.graph.matrices_size - 1]
-                        part = new_edges - block[nonterminal]
-                        block[nonterminal] += part.select('==', True)
-
-                    self.graph[nonterminal] += block[nonterminal]
-                    new_control_sum = self.graph[nonterminal].nvals
+                        with BOOL.ANY_PAIR:
+                            product = m.mxm(self.graph[label])
+                    if to in reached:
+                        product = difference(product, reached[to])
+                    if product.nvals == 0:
+                        continue
+                    if to in new_frontier:
+                        new_frontier[to] += product
+                    else:
+                        new_frontier[to] = product.dup()
+            for state, m in new_frontier.items():
+                if state in reached:
+                    reached[state] += m
+                else:
+                    reached[state] = m.dup()
+            frontier = new_frontier
+        return reached
+
+    def run(self, order: list) -> int:
+        """
+        @param order: components of nonterminals from get_regular_order
+        @return: number of iterations, it is always one pass over components
+        """
+        for component in order:
+            finals = {final for box in component for final in self.grammar.finish_states[box]}
+            for box in component:
+                reached = self.reach(self.grammar.start_state[box], component)
+                for final in finals:
+                    if final in reached:
+                        self.graph[box] += reached[final]
+        return 1
 
-                    if new_control_sum != control_sum:
-                        changed = True
 
-            first_iter = False
+class TensorSimpleAlgo(AllPathsProblem):
+    """
+    Tensor algorithm that recomputes Kronecker product and its closure on every iteration, see FullTensor.
+    Subclasses change the engine that finds nonterminal edges
+    """
+    engine = FullTensor
 
-            if self.grammar.nonterminals.isdisjoint(self.grammar.labels):
-                break
+    def prepare(self, graph: Graph, grammar: Union[RSM, CFG, Path]):
+        self.grammar = RecursiveAutomaton.from_grammar_or_path(grammar)
+        graph.load_bool_graph(labels=self.grammar.terminals)
+        self.graph = graph.view(self.grammar.nonterminals)
+        self.regular_order = self.grammar.get_regular_order()
+        self.fast_path = True
 
-        return ResultAlgo(self.graph[self.grammar.start_nonterm], iter)
+    def solve(self):
+        restore_eps_paths(self.grammar.start_and_finish, self.graph)
+        if self.fast_path and self.regular_order is not None:
+            iter = RegularTensor(self.grammar, self.graph).run(self.regular_order)
+        else:
+            iter = self.engine(self.grammar, self.graph).run()
+        return ResultAlgo(self.graph.to_external_matrix(self.graph[self.grammar.start_nonterm]), iter)
 
     def prepare_for_solve(self):
         for label in self.grammar.nonterminals:
@@ -184,9 +330,27 @@ class TensorDynamicAlgo(AllPathsProblem):
             self.kron += self.grammar[label].kronecker(self.graph[label])
 
     def getPaths(self, v_start: int, v_finish: int, nonterminal: str, max_len: int):
+        v_start, v_finish = self.graph.to_internal([v_start, v_finish])
         return TensorPathsNew(self.graph, self.grammar, self.kron).get_paths(v_start, v_finish, nonterminal, max_len)
 
     def get_sub_graph(self, v_start: int, v_finish: int, nonterminal: str, max_high: int):
-        return TensorExtractSubGraph(self.graph, self.grammar, self.kron, max_high).get_sub_graph(v_start,
-                                                                                                  v_finish,
-                                                                                                  nonterminal)
+        v_start, v_finish = self.graph.to_internal([v_start, v_finish])
+        sub_graph = TensorExtractSubGraph(self.graph, self.grammar, self.kron).get_sub_graph(v_start, v_finish,
+                                                                                             nonterminal)
+        return self.graph.to_external_graph(sub_graph)
+
+
+class TensorDynamicAlgo(TensorSimpleAlgo):
+    """
+    Tensor algorithm that keeps closure of Kronecker product between iterations and multiplies by RSA
+    only new nonterminal edges, see IncrementalTensor
+    """
+    engine = IncrementalTensor
+
+
+class TensorImplicitAlgo(TensorSimpleAlgo):
+    """
+    Tensor algorithm with implicit Kronecker product, see ImplicitTensor. Memory is bounded by
+    blocks of start states instead of the full product, the product is built only to extract paths
+    """
+    engine = ImplicitTensor
@@ -1,4 +1,4 @@
-from pygraphblas import Matrix, BOOL
+from pygraphblas import Matrix
 
 from src.graph.graph import Graph
 from src.grammar.rsa import RecursiveAutomaton
@@ -63,9 +63,7 @@ class TensorExtractSubGraph:
                     if label in self.rsa.nonterminals:
                         left += self.get_paths(graph_i, graph_k, label)
                     else:
-                        if label not in left.matrices:
-                            left[label] = Matrix.sparse(BOOL, self.graph_size, self.graph_size)
-                        left[label][graph_i, graph_k] = True
+                        left.allocate(label)[graph_i, graph_k] = True
 
             if left.is_empty:
                 continue
@@ -1,42 +1,110 @@
-from pygraphblas import BOOL
+from pygraphblas import BOOL, descriptor
 from pyformlang.cfg import CFG
 from src.graph.graph import Graph
 
 from src.problems.Base.Base import BaseProblem
 
 from src.grammar.cnf_grammar import CnfGrammar
+from src.grammar.rule_scheduler import RuleScheduler
+from src.grammar.rsa import RecursiveAutomaton
 from src.graph.label_graph import LabelGraph
-from src.problems.utils import ResultAlgo
+from src.problems.AllPaths.algo.tensor.tensor import RegularTensor, restore_eps_paths
+from src.problems.utils import ResultAlgo, optimize_grammar
+from src.utils.diagonal import identity
 
 
 class MatrixBaseAlgo(BaseProblem):
 
     def prepare(self, graph: Graph, grammar: CFG):
-        self.graph = graph
-        self.graph.load_bool_graph()
         self.grammar = CnfGrammar.from_cfg(grammar)
+        self.fast_path = True
+        self.rsa, self.regular_order = None, None
+        labels = self.grammar.terms
+        # regular grammar is solved by RSA without CNF fixpoint, see RegularTensor,
+        # so RSA and its terminals are needed only for regular grammars
+        if RecursiveAutomaton.is_regular_cfg(grammar):
+            self.rsa = RecursiveAutomaton.from_cfg(grammar)
+            self.regular_order = self.rsa.get_regular_order()
+            labels = labels.union(self.rsa.terminals)
+        graph.load_bool_graph(labels=labels)
+        self.graph = graph.view()
+        self.grammar_optimization = optimize_grammar(self.grammar, self.graph)
+        self.scheduler = RuleScheduler(self.grammar)
 
-    def solve(self):
+    def init_nonterminals(self) -> LabelGraph:
+        """
+        @return: matrices of nonterminals after applying eps and simple rules
+        """
         m = LabelGraph(self.graph.matrices_size)
-        
-        for l in self.grammar.eps_rules:
-            for i in range(m.matrices_size):
-                m[l][i, i] = True
-        
+
+        if len(self.grammar.eps_rules) > 0:
+            eps = identity(m.matrices_size)
+            for l in self.grammar.eps_rules:
+                nonterm = m.allocate(l)
+                nonterm += eps
+
         for l, r in self.grammar.simple_rules:
             m[l] += self.graph[r]
 
-        changed = True
-        iter = 0
-        while changed:
-            iter += 1
-            changed = False
-            for l, r1, r2 in self.grammar.complex_rules:
-                old_nnz = m[l].nvals
-                m[l] += m[r1].mxm(m[r2], semiring=BOOL.ANY_PAIR)
-                new_nnz = m[l].nvals
-                changed |= not old_nnz == new_nnz
-        return ResultAlgo(m[self.grammar.start_nonterm], iter)
+        return m
+
+    def solve_regular(self):
+        # the graph may be loaded with other types after prepare, so the type of view is set explicitly
+        view = self.graph.graph.view(self.rsa.nonterminals, self.graph.type)
+        restore_eps_paths(self.rsa.start_and_finish, view)
+        iter = RegularTensor(self.rsa, view).run(self.regular_order)
+        return ResultAlgo(self.graph.to_external_matrix(view[self.rsa.start_nonterm]), iter)
+
+    def solve(self):
+        if self.fast_path and self.regular_order is not None:
+            return self.solve_regular()
+
+        m = self.init_nonterminals()
+
+        def apply_rule(l, r1, r2):
+            old_nnz = m[l].nvals
+            m[l] += m[r1].mxm(m[r2], semiring=BOOL.ANY_PAIR)
+            return old_nnz != m[l].nvals
+
+        iter = self.scheduler.run(apply_rule)
+        return ResultAlgo(self.graph.to_external_matrix(m[self.grammar.start_nonterm]), iter)
 
     def prepare_for_solve(self):
         pass
+
+
+class MatrixBaseSemiNaiveAlgo(MatrixBaseAlgo):
+    """
+    Semi-naive evaluation of MatrixBaseAlgo: strata of RuleScheduler are evaluated in order, the first round
+    of stratum multiplies whole matrices, next rounds multiply only by paths found on the previous round (deltas),
+    l += delta_r1 * r2 + r1 * delta_r2, products are masked by paths already known for l
+    """
+
+    def solve(self):
+        if self.fast_path and self.regular_order is not None:
+            return self.solve_regular()
+
+        m = self.init_nonterminals()
+
+        iter = 0
+        for stratum in self.scheduler.strata:
+            # nonterminals of previous strata are final, so only nonterminals of stratum have deltas
+            delta = None
+            while delta is None or delta.get_number_of_edges() != 0:
+                iter += 1
+                new = LabelGraph(self.graph.matrices_size)
+                for l, r1, r2 in stratum.rules:
+                    if delta is None:
+                        new[l] += m[r1].mxm(m[r2], semiring=BOOL.ANY_PAIR, mask=m[l], desc=descriptor.C)
+                        continue
+                    if delta[r1].nvals != 0:
+                        new[l] += delta[r1].mxm(m[r2], semiring=BOOL.ANY_PAIR, mask=m[l], desc=descriptor.C)
+                    if delta[r2].nvals != 0:
+                        new[l] += m[r1].mxm(delta[r2], semiring=BOOL.ANY_PAIR, mask=m[l], desc=descriptor.C)
+
+                for l in new:
+                    m[l] += new[l]
+                if not stratum.is_recursive:
+                    break
+                delta = new
+        return ResultAlgo(self.graph.to_external_matrix(m[self.grammar.start_nonterm]), iter)
@@ -8,27 +8,18 @@ from pygraphblas.types import BOOL
 from src.grammar.cnf_grammar import CnfGrammar
 from src.graph.label_graph import LabelGraph
 from src.problems.MultipleSource.MultipleSource import MultipleSourceProblem
-from src.problems.utils import ResultAlgo
+from src.problems.utils import ResultAlgo, optimize_grammar
+from src.utils.diagonal import diagonal, columns_diagonal
 
 
 def update_sources(m: Matrix, dst: Matrix):
     """ dst += {(j, j) : (i, j) in m} by GrB_reduce src to a vector """
-
-    # Transpose src and reduce to a vector
-    J, V = m.T.reduce_vector(BOOL.ANY_MONOID).to_lists()
-
-    # If j-th column of src contains True then add (j, j) to dst
-    for k in range(len(J)):
-        if V[k] is True:
-            dst[J[k], J[k]] = True
+    dst += columns_diagonal(m)
 
 
 def update_sources_opt(m: Matrix, mask: Matrix, res: Matrix):
     """ res += {(j, j): (i, j) in m and (j, j) not in mask}"""
-    src_vec = m.reduce_vector(BOOL.ANY_MONOID, desc=descriptor.T0)
-    for i, _ in src_vec:
-        if (i, i) not in mask:
-            res[i, i] = 1
+    res += columns_diagonal(m).select('==', True, mask=mask, desc=descriptor.C)
 
 
 def init_simple_rules(rules, graph: Graph):
@@ -42,20 +33,24 @@ def init_simple_rules(rules, graph: Graph):
 class MatrixMSBruteAlgo(MultipleSourceProblem):
 
     def prepare(self, graph: Graph, grammar: CFG):
-        self.graph = graph
-        self.graph.load_bool_graph()
         self.grammar = CnfGrammar.from_cfg(grammar)
+        graph.load_bool_graph(labels=self.grammar.terms)
+        self.graph = graph.view()
+        self.grammar_optimization = optimize_grammar(self.grammar, self.graph)
 
         self.sources = LabelGraph(self.graph.matrices_size)
 
         # Initialize simple rules
         self.__initial_nonterminals = init_simple_rules(self.grammar.simple_rules, self.graph)
+        self.__initial_nonterminals.prune(used=self.grammar.nonterms)
 
     def clear_src(self):
         for label in self.sources.matrices:
             self.sources[label].clear()
 
     def solve(self, sources: Iterable):
+        sources = self.graph.to_internal(sources)
+
         # Creating new index per solve call
         # index = SingleSourceIndex(self.graph, self.grammar)
 
@@ -68,10 +63,9 @@ class MatrixMSBruteAlgo(MultipleSourceProblem):
             nnz[(l, r1, r2)] = (0, nonterminals[r1].nvals, nonterminals[r2].nvals)
 
         # Initialize source matrices masks
-        m_src = Matrix.sparse(BOOL, self.graph.matrices_size, self.graph.matrices_size)
-        for v in sources:
-            m_src[v, v] = True
-            self.sources[self.grammar.start_nonterm][v, v] = True
+        m_src = diagonal(sources, self.graph.matrices_size)
+        start_sources = self.sources.allocate(self.grammar.start_nonterm)
+        start_sources += m_src
 
         # Create temporary matrix
         tmp = Matrix.sparse(BOOL, self.graph.matrices_size, self.graph.matrices_size)
@@ -92,13 +86,13 @@ class MatrixMSBruteAlgo(MultipleSourceProblem):
                 new_nnz = self.sources[l].nvals, nonterminals[r1].nvals, nonterminals[r2].nvals
                 if nnz[(l, r1, r2)] != new_nnz:
                     # 1) r1_src += {(j, j) : (i, j) \in l_src}
-                    update_sources(self.sources[l], self.sources[r1])
+                    update_sources(self.sources[l], self.sources.allocate(r1))
 
                     # 2) tmp = l_src * r1
                     tmp = self.sources[l].mxm(nonterminals[r1], semiring=BOOL.ANY_PAIR)
 
                     # 3) r2_src += {(j, j) : (i, j) \in tmp}
-                    update_sources(tmp, self.sources[r2])
+                    update_sources(tmp, self.sources.allocate(r2))
 
                     # 4) l += tmp * r2
                     nonterminals[l] += tmp.mxm(nonterminals[r2], semiring=BOOL.ANY_PAIR)
@@ -107,24 +101,30 @@ class MatrixMSBruteAlgo(MultipleSourceProblem):
                     nnz[(l, r1, r2)] = self.sources[l].nvals, nonterminals[r1].nvals, nonterminals[r2].nvals
                     changed = True
 
-        return ResultAlgo(m_src.mxm(nonterminals[self.grammar.start_nonterm], semiring=BOOL.ANY_PAIR), iter), \
-               nonterminals[self.grammar.start_nonterm]
+        # sources allocated for nonterminals that are not reached are freed
+        self.sources.prune()
+        return ResultAlgo(self.graph.to_external_matrix(
+            m_src.mxm(nonterminals[self.grammar.start_nonterm], semiring=BOOL.ANY_PAIR)), iter), \
+               self.graph.to_external_matrix(nonterminals[self.grammar.start_nonterm])
 
 
 class MatrixMSOptAlgo(MultipleSourceProblem):
     def prepare(self, graph: Graph, grammar: CFG):
-        self.graph = graph
-        self.graph.load_bool_graph()
         self.grammar = CnfGrammar.from_cfg(grammar)
+        graph.load_bool_graph(labels=self.grammar.terms)
+        self.graph = graph.view()
+        self.grammar_optimization = optimize_grammar(self.grammar, self.graph)
 
         self.sources = LabelGraph(self.graph.matrices_size)
         self.nonterminals = init_simple_rules(self.grammar.simple_rules, self.graph)
+        self.nonterminals.prune(used=self.grammar.nonterms)
 
     def clear_src(self):
         for label in self.sources.matrices:
             self.sources[label].clear()
 
     def solve(self, sources: Iterable):
+        sources = self.graph.to_internal(sources)
         new_sources = LabelGraph(self.graph.matrices_size)
 
         # Initialize sources and nonterms nnz
@@ -134,11 +134,9 @@ class MatrixMSOptAlgo(MultipleSourceProblem):
             nnz[(l, r1, r2)] = (0, self.nonterminals[r1].nvals, self.nonterminals[r2].nvals)
 
         # Initialize source matrices masks
-        m_src = Matrix.sparse(BOOL, self.graph.matrices_size, self.graph.matrices_size)
-        for i in sources:
-            m_src[i, i] = True
-            if (i, i) not in self.sources[self.grammar.start_nonterm]:
-                new_sources[self.grammar.start_nonterm][i, i] = True
+        m_src = diagonal(sources, self.graph.matrices_size)
+        start_sources = new_sources.allocate(self.grammar.start_nonterm)
+        start_sources += m_src.select('==', True, mask=self.sources[self.grammar.start_nonterm], desc=descriptor.C)
 
         # Create temporary matrix
         tmp = Matrix.sparse(BOOL, self.graph.matrices_size, self.graph.matrices_size)
@@ -157,15 +155,14 @@ class MatrixMSOptAlgo(MultipleSourceProblem):
                 new_nnz = new_sources[l].nvals, self.nonterminals[r1].nvals, self.nonterminals[r2].nvals
                 if nnz[(l, r1, r2)] != new_nnz:
                     # 1) new[r1_src] += {(j, j) : (j, j) in new[l_src] and not in index[r1_src]}
-                    for i, _, _ in new_sources[l]:
-                        if (i, i) not in self.sources[r1]:
-                            new_sources[r1][i, i] = True
+                    r1_sources = new_sources.allocate(r1)
+                    r1_sources += new_sources[l].select('==', True, mask=self.sources[r1], desc=descriptor.C)
 
                     # 2) tmp = new[l_src] * index[r1]
                     new_sources[l].mxm(self.nonterminals[r1], out=tmp, semiring=BOOL.ANY_PAIR)
 
                     # 3) new[r2_src] += {(j, j) : (i, j) in tmp and not in index[r2_src]}
-                    update_sources_opt(tmp, self.sources[r2], new_sources[r2])
+                    update_sources_opt(tmp, self.sources[r2], new_sources.allocate(r2))
 
                     # 4) index[l] += tmp * index[r2]
                     self.nonterminals[l] += tmp.mxm(self.nonterminals[r2], semiring=BOOL.ANY_PAIR)
@@ -175,5 +172,7 @@ class MatrixMSOptAlgo(MultipleSourceProblem):
                     changed = True
         for n in self.grammar.nonterms:
             self.sources[n] += new_sources[n]
-        return ResultAlgo(m_src.mxm(self.nonterminals[self.grammar.start_nonterm], semiring=BOOL.ANY_PAIR), iter), \
-               self.nonterminals[self.grammar.start_nonterm]
+        self.sources.prune()
+        return ResultAlgo(self.graph.to_external_matrix(
+            m_src.mxm(self.nonterminals[self.grammar.start_nonterm], semiring=BOOL.ANY_PAIR)), iter), \
+               self.graph.to_external_matrix(self.nonterminals[self.grammar.start_nonterm])
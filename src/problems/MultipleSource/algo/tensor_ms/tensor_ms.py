@@ -11,16 +11,18 @@ from src.problems.MultipleSource.MultipleSource import MultipleSourceProblem
 from src.grammar.rsa import RecursiveAutomaton
 from src.graph.label_graph import LabelGraph
 
-from src.problems.AllPaths.algo.tensor.tensor import restore_eps_paths, transitive_closure
+from src.problems.AllPaths.algo.tensor.tensor import restore_eps_paths, StateBlocks
+from src.utils.closure import transitive_closure
+from src.utils.diagonal import diagonal, columns_diagonal
 from src.problems.utils import ResultAlgo
 
 
 class TensorMSAlgo(MultipleSourceProblem):
 
     def prepare(self, graph: Graph, grammar: Union[RSM, CFG, Path]):
-        self.graph = graph
-        self.graph.load_bool_graph()
         self.grammar = RecursiveAutomaton.from_grammar_or_path(grammar)
+        graph.load_bool_graph(labels=self.grammar.terminals)
+        self.graph = graph.view(self.grammar.nonterminals)
         self.part_graph = LabelGraph(self.graph.matrices_size)
         self.src_for_states = dict()
         for i in range(self.grammar.matrices_size):
@@ -34,17 +36,17 @@ class TensorMSAlgo(MultipleSourceProblem):
             self.graph[nonterm].clear()
 
     def solve(self, sources: Iterable):
+        sources = self.graph.to_internal(sources)
         restore_eps_paths(self.grammar.start_and_finish, self.graph)
 
         # Initialize source matrices masks
-        m_src = Matrix.sparse(BOOL, self.graph.matrices_size, self.graph.matrices_size)
-        for v in sources:
-            m_src[v, v] = True
-            self.src_for_states[self.grammar.start_state[self.grammar.start_nonterm]][v, v] = True
+        m_src = diagonal(sources, self.graph.matrices_size)
+        self.src_for_states[self.grammar.start_state[self.grammar.start_nonterm]] += m_src
 
         sizeKron = self.graph.matrices_size * self.grammar.matrices_size
 
         kron = Matrix.sparse(BOOL, sizeKron, sizeKron)
+        blocks = StateBlocks(self.grammar, self.graph.matrices_size)
 
         changed = True
         src_changed = True
@@ -66,8 +68,7 @@ class TensorMSAlgo(MultipleSourceProblem):
                         with BOOL.ANY_PAIR:
                             self.part_graph[out[1]] += self.src_for_states[state].mxm(self.graph[out[1]])
                         old_sum = self.src_for_states[out[0]].nvals
-                        for elem in self.part_graph[out[1]].T.reduce_vector(BOOL.ANY_MONOID):
-                            self.src_for_states[out[0]][elem[0], elem[0]] = True
+                        self.src_for_states[out[0]] += columns_diagonal(self.part_graph[out[1]])
                         if old_sum != self.src_for_states[out[0]].nvals:
                             src_changed = True
 
@@ -76,34 +77,20 @@ class TensorMSAlgo(MultipleSourceProblem):
 
             transitive_closure(kron)
 
-            for start in self.grammar.nonterminals:
-                for element in self.grammar.states[start]:
-                    i = element[0]
-                    j = element[1]
+            if len(blocks.update(self.graph, kron)) > 0:
+                changed = True
 
-                    start_i = i * self.graph.matrices_size
-                    start_j = j * self.graph.matrices_size
-
-                    control_sum = self.graph[start].nvals
-                    block = kron[start_i:start_i + self.graph.matrices_size - 1,
-                                 start_j: start_j + self.graph.matrices_size - 1]
-
-                    self.graph[start] += block
-                    new_control_sum = self.graph[start].nvals
-
-                    if new_control_sum != control_sum:
-                        changed = True
-
-        return ResultAlgo(m_src.mxm(self.graph[self.grammar.start_nonterm], semiring=BOOL.ANY_PAIR), iter), \
-               self.graph[self.grammar.start_nonterm]
+        return ResultAlgo(self.graph.to_external_matrix(
+            m_src.mxm(self.graph[self.grammar.start_nonterm], semiring=BOOL.ANY_PAIR)), iter), \
+               self.graph.to_external_matrix(self.graph[self.grammar.start_nonterm])
 
 
 class TensorMSAllAlgo(MultipleSourceProblem):
 
     def prepare(self, graph: Graph, grammar: Union[RSM, CFG, Path]):
-        self.graph = graph
-        self.graph.load_bool_graph()
         self.grammar = RecursiveAutomaton.from_grammar_or_path(grammar)
+        graph.load_bool_graph(labels=self.grammar.terminals)
+        self.graph = graph.view(self.grammar.nonterminals)
         self.part_graph = LabelGraph(self.graph.matrices_size)
         self.src_for_states = dict()
         for i in range(self.grammar.matrices_size):
@@ -117,14 +104,16 @@ class TensorMSAllAlgo(MultipleSourceProblem):
             self.graph[nonterm].clear()
 
     def solve(self, sources: Iterable):
+        sources = self.graph.to_internal(sources)
         restore_eps_paths(self.grammar.start_and_finish, self.graph)
 
-        for v in sources:
-            self.src_for_states[self.grammar.start_state[self.grammar.start_nonterm]][v, v] = True
+        self.src_for_states[self.grammar.start_state[self.grammar.start_nonterm]] += \
+            diagonal(sources, self.graph.matrices_size)
 
         sizeKron = self.graph.matrices_size * self.grammar.matrices_size
 
         kron = Matrix.sparse(BOOL, sizeKron, sizeKron)
+        blocks = StateBlocks(self.grammar, self.graph.matrices_size)
 
         changed = True
         iter = 0
@@ -146,8 +135,7 @@ class TensorMSAllAlgo(MultipleSourceProblem):
                             with BOOL.ANY_PAIR:
                                 self.part_graph[out[1]] += self.src_for_states[state].mxm(self.graph[out[1]])
                             old_sum = self.src_for_states[out[0]].nvals
-                            for elem in self.part_graph[out[1]].T.reduce_vector(BOOL.ANY_MONOID):
-                                self.src_for_states[out[0]][elem[0], elem[0]] = True
+                            self.src_for_states[out[0]] += columns_diagonal(self.part_graph[out[1]])
                             if old_sum != self.src_for_states[out[0]].nvals:
                                 src_changed = True
 
@@ -156,22 +144,7 @@ class TensorMSAllAlgo(MultipleSourceProblem):
 
             transitive_closure(kron)
 
-            for start in self.grammar.nonterminals:
-                for element in self.grammar.states[start]:
-                    i = element[0]
-                    j = element[1]
-
-                    start_i = i * self.graph.matrices_size
-                    start_j = j * self.graph.matrices_size
-
-                    control_sum = self.graph[start].nvals
-                    block = kron[start_i:start_i + self.graph.matrices_size - 1,
-                                 start_j: start_j + self.graph.matrices_size - 1]
-
-                    self.graph[start] += block
-                    new_control_sum = self.graph[start].nvals
-
-                    if new_control_sum != control_sum:
-                        changed = True
+            if len(blocks.update(self.graph, kron)) > 0:
+                changed = True
 
-        return ResultAlgo(self.graph[self.grammar.start_nonterm], iter)
\ No newline at end of file
+        return ResultAlgo(self.graph.to_external_matrix(self.graph[self.grammar.start_nonterm]), iter)
\ No newline at end of file
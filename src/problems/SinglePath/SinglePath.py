@@ -35,5 +35,17 @@ class SinglePathProblem(ABC):
         @param v_start: starting vertex for path
         @param v_finish: finishing vertex for path
         @param nonterminal: nonterminal from which path are being restored
+        @return: edges of path in order as numpy array of shape (number of edges, 2)
+        """
+        pass
+
+    @abstractmethod
+    def get_paths_batch(self, pairs, nonterminal: str):
+        """
+        Extract one path for every pair of vertices at once
+        @param pairs: array of pairs (starting vertex, finishing vertex) of shape (number of pairs, 2)
+        @param nonterminal: nonterminal from which paths are being restored
+        @return: offsets of shape (number of pairs + 1) and edges of shape (number of edges, 2),
+        edges of the k-th path are edges[offsets[k]:offsets[k + 1]]
         """
         pass
@@ -1,22 +1,36 @@
+import numpy as np
 from pyformlang.cfg import CFG
 from src.graph.graph import Graph
 
-from pygraphblas import Matrix
+from pygraphblas import descriptor
 
 from src.problems.SinglePath.SinglePath import SinglePathProblem
-from src.problems.SinglePath.algo.matrix_shortest_path.matrix_shortest_path import MatrixShortestPath
+from src.problems.SinglePath.algo.matrix_shortest_path.matrix_shortest_path import MatrixShortestPath, \
+    MatrixShortestPackedPath
 
 from src.graph.length_graph import LengthGraph, SAVELENGTHTYPE
+from src.graph.packed_index_graph import PackedIndexGraph
 from src.grammar.cnf_grammar import CnfGrammar
-from src.problems.utils import ResultAlgo
+from src.grammar.rule_scheduler import RuleScheduler
+from src.problems.utils import ResultAlgo, optimize_grammar
 
 
 class MatrixShortestAlgo(SinglePathProblem):
 
+    def load_graph(self, graph: Graph, labels: set):
+        """
+        Load matrices of graph used by the index
+        @param graph: graph of query
+        @param labels: terminals of grammar
+        """
+        graph.load_save_length_graph(labels=labels)
+
     def prepare(self, graph: Graph, grammar: CFG):
-        self.graph = graph
-        self.graph.load_save_length_graph()
         self.grammar = CnfGrammar.from_cfg(grammar)
+        self.load_graph(graph, self.grammar.terms)
+        self.graph = graph.view()
+        self.grammar_optimization = optimize_grammar(self.grammar, self.graph)
+        self.scheduler = RuleScheduler(self.grammar)
 
     def solve(self):
         IndexType_monoid = SAVELENGTHTYPE.new_monoid(SAVELENGTHTYPE.PLUS, SAVELENGTHTYPE.one)
@@ -26,29 +40,68 @@ class MatrixShortestAlgo(SinglePathProblem):
             for l, r in self.grammar.simple_rules:
                 m[l] += self.graph[r]
 
-            iter = 0
-            changed_nonterms = self.grammar.nonterms
-            while len(changed_nonterms) > 0:
-                iter += 1
-                new_changes = set()
-                for l, r1, r2 in self.grammar.complex_rules:
-                    if r1 in changed_nonterms or r2 in changed_nonterms:
-                        old_m = m[l].dup()
-                        old_nnz = m[l].nvals
-                        m[l] += m[r1].mxm(m[r2])
-                        new_nnz = m[l].nvals
-                        if not old_nnz == new_nnz:
-                            new_changes.add(l)
-                        elif new_nnz > 0:
-                            C = m[l].emult(old_m, SAVELENGTHTYPE.SUBTRACTION)
-                            if C.nonzero().nvals > 0:
-                                new_changes.add(l)
-                changed_nonterms = new_changes
+            def apply_rule(l, r1, r2):
+                product = m[r1].mxm(m[r2])
+                # delta: paths to pairs without path in l and paths shorter than the ones in l
+                delta = product.emult(m[l], SAVELENGTHTYPE.SHORTER).nonzero()
+                delta += product.select('!=0', mask=m[l], desc=descriptor.C & descriptor.S)
+                if delta.nvals == 0:
+                    return False
+                m[l] += delta
+                return True
+
+            iter = self.scheduler.run(apply_rule)
+            m.prune(used=self.grammar.nonterms)
             self.res_m = m
-            return ResultAlgo(m[self.grammar.start_nonterm], iter)
+            self.index_path = None
+            return ResultAlgo(self.graph.to_external_matrix(m[self.grammar.start_nonterm]), iter)
 
     def prepare_for_solve(self):
         pass
 
+    def get_index_path(self) -> MatrixShortestPath:
+        """
+        @return: reader of paths from index, it is shared by extractions of paths after solve
+        """
+        if self.index_path is None:
+            self.index_path = MatrixShortestPath(self.res_m, self.grammar)
+        return self.index_path
+
     def getPath(self, v_start: int, v_finish: int, nonterminal: str):
-        return MatrixShortestPath(self.res_m, self.grammar).get_path(v_start, v_finish, nonterminal)
\ No newline at end of file
+        v_start, v_finish = self.graph.to_internal([v_start, v_finish])
+        path = self.get_index_path().get_path(v_start, v_finish, nonterminal)
+        return self.graph.to_external_edges(path)
+
+    def get_paths_batch(self, pairs, nonterminal: str):
+        pairs = np.array(self.graph.to_internal(np.asarray(pairs, dtype=np.int64).ravel()), dtype=np.int64)
+        offsets, edges = self.get_index_path().get_paths_batch(pairs.reshape(-1, 2), nonterminal)
+        return offsets, self.graph.to_external_edges(edges)
+
+
+class MatrixShortestPackedAlgo(MatrixShortestAlgo):
+    """
+    MatrixShortestAlgo with index packed into uint64 and built-in semirings instead of SAVELENGTHTYPE,
+    see PackedIndexGraph
+    """
+
+    def load_graph(self, graph: Graph, labels: set):
+        graph.load_bool_graph(labels=labels)
+
+    def solve(self):
+        m = PackedIndexGraph(self.graph.matrices_size)
+        for l, r in self.grammar.simple_rules:
+            m.update(l, m.from_edges(self.graph[r]))
+
+        def apply_rule(l, r1, r2):
+            return m.update(l, m.shortest_product(m[r1], m[r2]))
+
+        iter = self.scheduler.run(apply_rule)
+        m.prune(used=self.grammar.nonterms)
+        self.res_m = m
+        self.index_path = None
+        return ResultAlgo(self.graph.to_external_matrix(m[self.grammar.start_nonterm]), iter)
+
+    def get_index_path(self) -> MatrixShortestPackedPath:
+        if self.index_path is None:
+            self.index_path = MatrixShortestPackedPath(self.res_m, self.grammar)
+        return self.index_path
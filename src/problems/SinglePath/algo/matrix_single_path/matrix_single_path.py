@@ -1,39 +1,38 @@
-from src.grammar.cnf_grammar import CnfGrammar
-from src.graph.index_graph import IndexGraph
-
-
-class MatrixSinglePath:
-    def __init__(self, graph: IndexGraph, grammar: CnfGrammar):
-        self.length = 0
-        self.m = graph
-        self.grammar = grammar
-
-    def get_path(self, i, j, s):
-        def is_identity(lft, r, mid, h, lng):
-            return lft == 0 and r == 0 and mid == 0 and h == 0 and lng == 0
-
-        left, right, middle, height, length = self.m[s].get(i, j)
-        if is_identity(left, right, middle, height, length):
-            print("Index isn`t correct\n")
-
-        if height == 1:
-            self.length += 1
-
-        for l, r1, r2 in self.grammar.complex_rules:
-            if s == l:
-                left_r1, right_r1, middle_r1, height_r1, length_r1 = 0, 0, 0, 0, 0
-                if (left, middle) in self.m[r1]:
-                    left_r1, right_r1, middle_r1, height_r1, length_r1 = self.m[r1].get(left, middle)
-                left_r2, right_r2, middle_r2, height_r2, length_r2 = 0, 0, 0, 0, 0
-                if (middle, right) in self.m[r2]:
-                    left_r2, right_r2, middle_r2, height_r2, length_r2 = self.m[r2].get(middle, right)
-
-                if not is_identity(left_r1, right_r1, middle_r1, height_r1, length_r1) and \
-                        not is_identity(left_r2, right_r2, middle_r2, height_r2, length_r2):
-                    max_height = height_r2 if height_r1 < height_r2 else height_r1
-                    if height == max_height + 1:
-                        self.get_path(left, middle, r1)
-                        self.get_path(middle, right, r2)
-                        break
-
-        return self.length
+import numpy as np
+
+from src.problems.SinglePath.index_path import IndexPath, PackedIndexPath
+
+
+class MatrixSinglePath(PackedIndexPath):
+    """
+    Path from index of MatrixSingleAlgo, element is pair (height, middle)
+    """
+
+    def is_derived(self, element, element_r1, element_r2) -> bool:
+        return element[0] == max(element_r1[0], element_r2[0]) + 1
+
+    def is_derived_keys(self, key: np.ndarray, key_r1: np.ndarray, key_r2: np.ndarray) -> np.ndarray:
+        return key == np.maximum(key_r1, key_r2) + 1
+
+
+class MatrixSingleUdtPath(IndexPath):
+    """
+    Path from index of MatrixSingleUdtAlgo, element is SAVEMIDDLETYPE (left, right, middle, height, length)
+    """
+
+    def is_edge(self, element) -> bool:
+        return element[3] == 1
+
+    def get_middle(self, element) -> int:
+        return element[2]
+
+    def is_derived(self, element, element_r1, element_r2) -> bool:
+        return element[3] == max(element_r1[3], element_r2[3]) + 1
+
+    def to_arrays(self, values: list) -> tuple:
+        values = np.asarray(values, dtype=np.int64).reshape(-1, 5)
+        return values[:, 3], values[:, 2]
+
+    def is_derived_keys(self, key: np.ndarray, key_r1: np.ndarray, key_r2: np.ndarray) -> np.ndarray:
+        return key == np.maximum(key_r1, key_r2) + 1
+
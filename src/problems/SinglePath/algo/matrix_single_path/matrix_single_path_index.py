@@ -1,20 +1,81 @@
+import numpy as np
 from pyformlang.cfg import CFG
 from src.graph.graph import Graph
 
 from src.problems.SinglePath.SinglePath import SinglePathProblem
-from src.problems.SinglePath.algo.matrix_single_path.matrix_single_path import MatrixSinglePath
+from src.problems.SinglePath.algo.matrix_single_path.matrix_single_path import MatrixSinglePath, MatrixSingleUdtPath
 
 from src.graph.index_graph import IndexGraph, SAVEMIDDLETYPE
+from src.graph.packed_index_graph import PackedIndexGraph
 from src.grammar.cnf_grammar import CnfGrammar
-from src.problems.utils import ResultAlgo
+from src.grammar.rule_scheduler import RuleScheduler
+from src.problems.utils import ResultAlgo, optimize_grammar
 
 
 class MatrixSingleAlgo(SinglePathProblem):
+    """
+    Single path algorithm with compact index: only height of path and middle vertex packed into uint64
+    are stored, products are computed by built-in semirings, see PackedIndexGraph
+    """
+
+    def load_graph(self, graph: Graph, labels: set):
+        """
+        Load matrices of graph used by the index, edges are packed by PackedIndexGraph.from_edges
+        @param graph: graph of query
+        @param labels: terminals of grammar
+        """
+        graph.load_bool_graph(labels=labels)
 
     def prepare(self, graph: Graph, grammar: CFG):
-        self.graph = graph
-        self.graph.load_save_middle_graph()
         self.grammar = CnfGrammar.from_cfg(grammar)
+        self.load_graph(graph, self.grammar.terms)
+        self.graph = graph.view()
+        self.grammar_optimization = optimize_grammar(self.grammar, self.graph)
+        self.scheduler = RuleScheduler(self.grammar)
+
+    def solve(self):
+        m = PackedIndexGraph(self.graph.matrices_size)
+        for l, r in self.grammar.simple_rules:
+            m.update(l, m.from_edges(self.graph[r]))
+
+        def apply_rule(l, r1, r2):
+            return m.update(l, m.single_product(m[r1], m[r2]))
+
+        iter = self.scheduler.run(apply_rule)
+        m.prune(used=self.grammar.nonterms)
+        self.res_m = m
+        self.index_path = None
+        return ResultAlgo(self.graph.to_external_matrix(m[self.grammar.start_nonterm]), iter)
+
+    def prepare_for_solve(self):
+        pass
+
+    def get_index_path(self) -> MatrixSinglePath:
+        """
+        @return: reader of paths from index, it is shared by extractions of paths after solve
+        """
+        if self.index_path is None:
+            self.index_path = MatrixSinglePath(self.res_m, self.grammar)
+        return self.index_path
+
+    def getPath(self, v_start: int, v_finish: int, nonterminal: str):
+        v_start, v_finish = self.graph.to_internal([v_start, v_finish])
+        path = self.get_index_path().get_path(v_start, v_finish, nonterminal)
+        return self.graph.to_external_edges(path)
+
+    def get_paths_batch(self, pairs, nonterminal: str):
+        pairs = np.array(self.graph.to_internal(np.asarray(pairs, dtype=np.int64).ravel()), dtype=np.int64)
+        offsets, edges = self.get_index_path().get_paths_batch(pairs.reshape(-1, 2), nonterminal)
+        return offsets, self.graph.to_external_edges(edges)
+
+
+class MatrixSingleUdtAlgo(MatrixSingleAlgo):
+    """
+    Single path algorithm with index of user-defined type SAVEMIDDLETYPE, it is kept to compare with MatrixSingleAlgo
+    """
+
+    def load_graph(self, graph: Graph, labels: set):
+        graph.load_save_middle_graph(labels=labels)
 
     def solve(self):
         IndexType_monoid = SAVEMIDDLETYPE.new_monoid(SAVEMIDDLETYPE.PLUS, SAVEMIDDLETYPE.one)
@@ -24,22 +85,18 @@ class MatrixSingleAlgo(SinglePathProblem):
             for l, r in self.grammar.simple_rules:
                 m[l] += self.graph[r]
 
-            changed = True
-            iter = 0
-            while changed:
-                iter += 1
-                changed = False
-                for l, r1, r2 in self.grammar.complex_rules:
-                    old_nnz = m[l].nvals
-                    m[l] += m[r1].mxm(m[r2])
-                    new_nnz = m[l].nvals
-                    if not old_nnz == new_nnz:
-                        changed = True
-            self.res_m = m
-            return ResultAlgo(m[self.grammar.start_nonterm], iter)
+            def apply_rule(l, r1, r2):
+                old_nnz = m[l].nvals
+                m[l] += m[r1].mxm(m[r2])
+                return old_nnz != m[l].nvals
 
-    def prepare_for_solve(self):
-        pass
+            iter = self.scheduler.run(apply_rule)
+            m.prune(used=self.grammar.nonterms)
+            self.res_m = m
+            self.index_path = None
+            return ResultAlgo(self.graph.to_external_matrix(m[self.grammar.start_nonterm]), iter)
 
-    def getPath(self, v_start: int, v_finish: int, nonterminal: str):
-        return MatrixSinglePath(self.res_m, self.grammar).get_path(v_start, v_finish, nonterminal)
\ No newline at end of file
+    def get_index_path(self) -> MatrixSingleUdtPath:
+        if self.index_path is None:
+            self.index_path = MatrixSingleUdtPath(self.res_m, self.grammar)
+        return self.index_path
@@ -0,0 +1,247 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from src.grammar.cnf_grammar import CnfGrammar
+from src.graph.matrix_container import MatrixContainer
+from src.graph.packed_index_graph import unpack, KEY_SHIFT, MIDDLE_MASK
+
+
+class IndexPath(ABC):
+    """
+    Reconstruction of one path from index of single path algorithms. Derivation tree is traversed
+    with explicit stack, so the length of path is not limited by recursion, and rules of nonterminal
+    are taken from index of rules by head. Subclasses define the format of index elements
+    """
+
+    def __init__(self, graph: MatrixContainer, grammar: CnfGrammar):
+        self.m = graph
+        self.rules_by_head = grammar.get_rules_by_head()
+        self.nonterms = sorted(grammar.nonterms)
+        self.arrays = None
+
+    def get_element(self, s, i, j):
+        """
+        @return: index element of path from i to j derived from nonterminal s or None if there is no path
+        """
+        return self.m[s].get(i, j)
+
+    @abstractmethod
+    def is_edge(self, element) -> bool:
+        """
+        @return: whether path of element is one edge of graph
+        """
+        pass
+
+    @abstractmethod
+    def get_middle(self, element) -> int:
+        """
+        @return: middle vertex of path of element
+        """
+        pass
+
+    @abstractmethod
+    def is_derived(self, element, element_r1, element_r2) -> bool:
+        """
+        @return: whether element is built from paths of the right side of rule
+        """
+        pass
+
+    @abstractmethod
+    def to_arrays(self, values: list) -> tuple:
+        """
+        @param values: values of index elements returned by Matrix.to_lists
+        @return: numpy arrays of keys (height or length of path) and middle vertices of elements
+        """
+        pass
+
+    @abstractmethod
+    def is_derived_keys(self, key: np.ndarray, key_r1: np.ndarray, key_r2: np.ndarray) -> np.ndarray:
+        """
+        Vectorized is_derived by keys of elements
+        """
+        pass
+
+    def get_path(self, i, j, s) -> np.ndarray:
+        """
+        @param i: starting vertex of path
+        @param j: finishing vertex of path
+        @param s: nonterminal from which path is restored
+        @return: edges of path in order as array of shape (number of edges, 2)
+        @raise ValueError: if index has no element of the path or no rule derives the element
+        """
+        edges = []
+        stack = [(i, j, s)]
+        while len(stack) > 0:
+            i, j, s = stack.pop()
+            element = self.get_element(s, i, j)
+            if element is None:
+                raise ValueError(f'Index isn`t correct: no path from {i} to {j} derived from {s}')
+
+            if self.is_edge(element):
+                edges.append((i, j))
+                continue
+
+            middle = self.get_middle(element)
+            for r1, r2 in self.rules_by_head.get(s, []):
+                element_r1 = self.get_element(r1, i, middle)
+                if element_r1 is None:
+                    continue
+                element_r2 = self.get_element(r2, middle, j)
+                if element_r2 is not None and self.is_derived(element, element_r1, element_r2):
+                    # the right part is restored after the left one
+                    stack.append((middle, j, r2))
+                    stack.append((i, middle, r1))
+                    break
+            else:
+                raise ValueError(f'Index isn`t correct: no rule of {s} derives path from {i} to {j}')
+
+        return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+    def get_arrays(self) -> dict:
+        """
+        Pull index into numpy arrays once: {nonterminal: (sorted codes i * size + j, keys, middles)}
+        """
+        if self.arrays is None:
+            self.arrays = dict()
+            for s in self.nonterms:
+                rows, cols, values = self.m[s].to_lists()
+                codes = np.asarray(rows, dtype=np.int64) * self.m.matrices_size + np.asarray(cols, dtype=np.int64)
+                keys, middles = self.to_arrays(values)
+                order = np.argsort(codes)
+                self.arrays[s] = codes[order], keys[order], middles[order]
+        return self.arrays
+
+    def lookup(self, s: str, i: np.ndarray, j: np.ndarray) -> tuple:
+        """
+        @return: mask of pairs (i, j) with path derived from s, keys and middles of their elements
+        """
+        codes, keys, middles = self.get_arrays()[s]
+        query = i * self.m.matrices_size + j
+        if len(codes) == 0:
+            empty = np.zeros(len(query), dtype=np.int64)
+            return np.zeros(len(query), dtype=bool), empty, empty
+        position = np.minimum(np.searchsorted(codes, query), len(codes) - 1)
+        found = codes[position] == query
+        return found, keys[position], middles[position]
+
+    def get_paths_batch(self, pairs: np.ndarray, s: str) -> tuple:
+        """
+        Restore paths for many pairs of vertices at once. Derivation trees of all paths are expanded level by level
+        with vectorized lookups in the index, then the number of edges of every node is computed bottom-up
+        and the position of its first edge is computed top-down
+        @param pairs: array of shape (number of pairs, 2)
+        @param s: nonterminal from which paths are restored
+        @return: offsets of shape (number of pairs + 1) and edges of shape (number of edges, 2),
+        edges of the k-th path are edges[offsets[k]:offsets[k + 1]]
+        @raise ValueError: if index has no element of some path or no rule derives the element
+        """
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        nonterm_ids = {nonterm: k for k, nonterm in enumerate(self.nonterms)}
+        if len(pairs) > 0 and s not in nonterm_ids:
+            i, j = pairs[0]
+            raise ValueError(f'Index isn`t correct: no path from {i} to {j} derived from {s}')
+
+        # nodes of derivation trees are numbered level by level, the first len(pairs) nodes are roots
+        i, j = pairs[:, 0], pairs[:, 1]
+        nonterms = np.full(len(pairs), nonterm_ids.get(s, 0), dtype=np.int64)
+        node_i, node_j = [i], [j]
+        size = len(pairs)
+        frontier = np.arange(size)
+        levels, is_leaf, left = [], [], []
+        while len(frontier) > 0:
+            leaf = np.zeros(len(frontier), dtype=bool)
+            level_left = np.full(len(frontier), -1, dtype=np.int64)
+            children_i, children_j, children_s = [], [], []
+            for nonterm_id in np.unique(nonterms):
+                nonterm = self.nonterms[nonterm_id]
+                group = np.flatnonzero(nonterms == nonterm_id)
+                found, key, middle = self.lookup(nonterm, i[group], j[group])
+                if not found.all():
+                    k = group[np.argmin(found)]
+                    raise ValueError(f'Index isn`t correct: no path from {i[k]} to {j[k]} derived from {nonterm}')
+                leaf[group] = key == 1
+
+                unresolved = key != 1
+                for r1, r2 in self.rules_by_head.get(nonterm, []):
+                    if not unresolved.any():
+                        break
+                    candidates = np.flatnonzero(unresolved)
+                    gi, gj, gm, gk = i[group][candidates], j[group][candidates], middle[candidates], key[candidates]
+                    found_r1, key_r1, _ = self.lookup(r1, gi, gm)
+                    found_r2, key_r2, _ = self.lookup(r2, gm, gj)
+                    derived = found_r1 & found_r2 & self.is_derived_keys(gk, key_r1, key_r2)
+                    resolved = candidates[derived]
+                    unresolved[resolved] = False
+
+                    # children of resolved node are left (i, middle, r1) and right (middle, j, r2)
+                    count = len(resolved)
+                    level_left[group[resolved]] = size + np.arange(count) * 2
+                    children_i.append(np.stack([gi[derived], gm[derived]], axis=1).ravel())
+                    children_j.append(np.stack([gm[derived], gj[derived]], axis=1).ravel())
+                    children_s.append(np.tile([nonterm_ids[r1], nonterm_ids[r2]], count))
+                    size += 2 * count
+
+                if unresolved.any():
+                    k = group[np.argmax(unresolved)]
+                    raise ValueError(f'Index isn`t correct: no rule of {nonterm} derives path from {i[k]} to {j[k]}')
+
+            levels.append(frontier)
+            is_leaf.append(leaf)
+            left.append(level_left)
+            if len(children_i) == 0:
+                break
+            i, j, nonterms = np.concatenate(children_i), np.concatenate(children_j), np.concatenate(children_s)
+            node_i.append(i)
+            node_j.append(j)
+            frontier = np.arange(size - len(i), size)
+
+        node_i, node_j = np.concatenate(node_i), np.concatenate(node_j)
+        left_child = np.full(size, -1, dtype=np.int64)
+        leaves = np.zeros(size, dtype=bool)
+        for frontier, level_left, leaf in zip(levels, left, is_leaf):
+            left_child[frontier] = level_left
+            leaves[frontier] = leaf
+
+        # number of edges of every node bottom-up, right child follows left one
+        counts = leaves.astype(np.int64)
+        for frontier in reversed(levels):
+            internal = frontier[left_child[frontier] >= 0]
+            counts[internal] = counts[left_child[internal]] + counts[left_child[internal] + 1]
+
+        offsets = np.zeros(len(pairs) + 1, dtype=np.int64)
+        np.cumsum(counts[:len(pairs)], out=offsets[1:])
+
+        # position of the first edge of every node top-down
+        first = np.zeros(size, dtype=np.int64)
+        first[:len(pairs)] = offsets[:-1]
+        for frontier in levels:
+            internal = frontier[left_child[frontier] >= 0]
+            first[left_child[internal]] = first[internal]
+            first[left_child[internal] + 1] = first[internal] + counts[left_child[internal]]
+
+        edges = np.zeros((offsets[-1], 2), dtype=np.int64)
+        edges[first[leaves], 0] = node_i[leaves]
+        edges[first[leaves], 1] = node_j[leaves]
+        return offsets, edges
+
+
+class PackedIndexPath(IndexPath):
+    """
+    Path from index packed into uint64, see PackedIndexGraph, element is pair (key, middle).
+    Subclasses define how key of element is derived from keys of the right side of rule
+    """
+
+    def get_element(self, s, i, j):
+        value = self.m[s].get(i, j)
+        return None if value is None else unpack(value)
+
+    def is_edge(self, element) -> bool:
+        return element[0] == 1
+
+    def get_middle(self, element) -> int:
+        return element[1]
+
+    def to_arrays(self, values: list) -> tuple:
+        values = np.asarray(values, dtype=np.uint64)
+        return (values >> np.uint64(KEY_SHIFT)).astype(np.int64), (values & np.uint64(MIDDLE_MASK)).astype(np.int64)
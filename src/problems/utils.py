@@ -1,7 +1,20 @@
 from pygraphblas import Matrix
 
+from src.grammar.cnf_grammar import CnfGrammar, GrammarOptimization
+from src.graph.matrix_container import MatrixContainer
+
 
 class ResultAlgo:
     def __init__(self, matrix_S: Matrix, iter: int):
         self.matrix_S = matrix_S
         self.number_iter = iter
+
+
+def optimize_grammar(grammar: CnfGrammar, graph: MatrixContainer) -> GrammarOptimization:
+    """
+    Prune grammar against labels of loaded graph before solving, see CnfGrammar.optimize
+    @param grammar: grammar of query
+    @param graph: graph loaded with terminals of grammar
+    @return: numbers of removed rules and nonterminals, they are reported by benchmarks
+    """
+    return grammar.optimize(graph.get_nonempty(grammar.terms))
@@ -0,0 +1,87 @@
+from pygraphblas import Matrix, BOOL, descriptor
+
+CLOSURE_STRATEGIES = ['naive', 'delta', 'squaring', 'auto']
+
+"""
+Density of matrix from which auto strategy uses squaring from the start
+"""
+AUTO_DENSITY = 0.01
+
+"""
+Part of new entries among all entries from which auto strategy switches from delta to squaring
+"""
+AUTO_DELTA_PART = 0.5
+
+
+def transitive_closure(m: Matrix, strategy='auto') -> int:
+    """
+    Transitive closure of boolean matrix in place
+    @param m: matrix to close
+    @param strategy: one of CLOSURE_STRATEGIES:
+    naive --- m += degree, where degree is multiplied by m, until the number of entries is not changed;
+    delta --- multiply only by entries found on the previous round, see update_closure;
+    squaring --- m += m * m until the number of entries is not changed, the number of rounds is logarithmic;
+    auto --- squaring for dense matrices, otherwise delta until new entries make up a large part of matrix
+    @return: number of rounds
+    """
+    if strategy == 'naive':
+        return naive_closure(m)
+    if strategy == 'delta':
+        return update_closure(m, m.dup())
+    if strategy == 'squaring':
+        return squaring_closure(m)
+    if strategy == 'auto':
+        if m.nvals >= AUTO_DENSITY * m.nrows * m.ncols:
+            return squaring_closure(m)
+        return update_closure(m, m.dup(), switch_part=AUTO_DELTA_PART)
+    raise Exception(f'Unknown closure strategy {strategy}, expected one of {CLOSURE_STRATEGIES}')
+
+
+def naive_closure(m: Matrix) -> int:
+    rounds = 1
+    prev = m.nvals
+    degree = m
+    with BOOL.ANY_PAIR:
+        degree = degree @ m
+        m += degree
+    while prev != m.nvals:
+        rounds += 1
+        prev = m.nvals
+        with BOOL.ANY_PAIR:
+            degree = degree @ m
+            m += degree
+    return rounds
+
+
+def squaring_closure(m: Matrix) -> int:
+    rounds = 0
+    prev = None
+    while prev != m.nvals:
+        rounds += 1
+        prev = m.nvals
+        with BOOL.ANY_PAIR:
+            m += m @ m
+    return rounds
+
+
+def update_closure(closure: Matrix, delta: Matrix, switch_part=None) -> int:
+    """
+    Add edges to transitively closed matrix and close it again, only products with new entries are computed:
+    closure += delta, then delta = (delta * closure + closure * delta) without known entries until it is empty
+    @param closure: transitively closed matrix, it is updated in place
+    @param delta: new edges
+    @param switch_part: if entries found by a round make up at least this part of closure,
+    the rest is closed by squaring
+    @return: number of rounds
+    """
+    rounds = 0
+    with BOOL.ANY_PAIR:
+        closure += delta
+        while delta.nvals != 0:
+            if switch_part is not None and rounds > 0 and delta.nvals >= switch_part * closure.nvals:
+                return rounds + squaring_closure(closure)
+            rounds += 1
+            delta = delta.mxm(closure, mask=closure, desc=descriptor.C) + \
+                closure.mxm(delta, mask=closure, desc=descriptor.C)
+            closure += delta
+    return rounds
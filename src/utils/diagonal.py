@@ -0,0 +1,37 @@
+from typing import Iterable
+
+from pygraphblas import Matrix, BOOL
+
+
+def diagonal(indices: Iterable, size: int) -> Matrix:
+    """
+    Build boolean diagonal matrix with one bulk operation instead of setting elements one by one
+    @param indices: indices i of elements (i, i)
+    @param size: size of matrix
+    @return: matrix {(i, i): i in indices}
+    """
+    indices = list(indices)
+    return Matrix.from_lists(indices, indices, [True] * len(indices), nrows=size, ncols=size, typ=BOOL)
+
+
+def identity(size: int) -> Matrix:
+    """
+    @return: boolean identity matrix of the given size
+    """
+    return diagonal(range(size), size)
+
+
+def rows_diagonal(m: Matrix) -> Matrix:
+    """
+    @return: {(i, i): i-th row of m is not empty}
+    """
+    rows, _ = m.reduce_vector(BOOL.ANY_MONOID).to_lists()
+    return diagonal(rows, m.nrows)
+
+
+def columns_diagonal(m: Matrix) -> Matrix:
+    """
+    @return: {(j, j): j-th column of m is not empty}
+    """
+    columns, _ = m.T.reduce_vector(BOOL.ANY_MONOID).to_lists()
+    return diagonal(columns, m.ncols)
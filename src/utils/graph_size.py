@@ -1,4 +1,11 @@
+from src.graph.graph_meta import read_graph_meta
+
+
 def get_graph_size(path):
+    meta = read_graph_meta(path)
+    if 'vertices' in meta:
+        return meta['vertices']
+
     res = -1
     with open(path, 'r') as f:
         for line in f.readlines():
@@ -1,6 +1,11 @@
+import os
 from pathlib import Path
 
 CFPQ_PYALGO_ROOT = Path(__file__).parent.parent.parent
 
 GLOBAL_CFPQ_DATA = Path(CFPQ_PYALGO_ROOT).joinpath('deps/CFPQ_Data/data')
 LOCAL_CFPQ_DATA = Path(CFPQ_PYALGO_ROOT).joinpath('test/data')
+
+# compiled grammars are cached in the user cache directory, CFPQ_GRAMMAR_CACHE sets another directory
+USER_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME', Path.home().joinpath('.cache')))
+GRAMMAR_CACHE_DIR = Path(os.environ.get('CFPQ_GRAMMAR_CACHE', USER_CACHE_DIR.joinpath('cfpq_pyalgo/grammars')))
@@ -1,8 +1,8 @@
 import pytest
 
-from src.problems.AllPaths.algo.tensor.tensor import TensorSimpleAlgo, TensorDynamicAlgo
+from src.problems.AllPaths.algo.tensor.tensor import TensorSimpleAlgo, TensorDynamicAlgo, TensorImplicitAlgo
 
 
-@pytest.fixture(params=[TensorSimpleAlgo, TensorDynamicAlgo])
+@pytest.fixture(params=[TensorSimpleAlgo, TensorDynamicAlgo, TensorImplicitAlgo])
 def algo(request):
     return request.param
@@ -102,3 +102,53 @@ def test_two_nonterm(algo):
     allpath_algo.prepare_for_exctract_paths()
     paths = allpath_algo.getPaths(1, 1, "S", 3)
     assert len(paths) == 1
+
+
+@pytest.mark.CI
+def test_shared_graph(algo):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('two_nonterm')
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'))
+    grammar = cfg_from_txt(test_data_path.joinpath('Grammars/g.cfg'))
+
+    first_algo: AllPathsProblem = algo()
+    first_algo.prepare(graph, grammar)
+    second_algo: AllPathsProblem = algo()
+    second_algo.prepare(graph, grammar)
+
+    assert first_algo.solve().matrix_S.nvals == 156
+    assert second_algo.solve().matrix_S.nvals == 156
+    assert graph.matrices.keys().isdisjoint(first_algo.grammar.nonterminals)
+
+
+@pytest.mark.CI
+def test_sub_graph_compact_ids(algo, tmp_path):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('binary_tree')
+    grammar = cfg_from_txt(test_data_path.joinpath('Grammars/g.cfg'))
+
+    def sparse_id(v):
+        return 1000 * int(v) + 7
+
+    path = tmp_path.joinpath('graph.txt')
+    with open(test_data_path.joinpath('Graphs/graph_1.txt'), 'r') as f, open(path, 'w') as out:
+        for line in f.readlines():
+            v, label, to = line.split()
+            out.write(f'{sparse_id(v)} {label} {sparse_id(to)}\n')
+
+    def sub_graph_edges(sub_graph):
+        return {(label, i, j) for label in sub_graph for i, j, _ in sub_graph[label]}
+
+    allpath_algo: AllPathsProblem = algo()
+    allpath_algo.prepare(Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt')), grammar)
+    allpath_algo.solve()
+    allpath_algo.prepare_for_exctract_paths()
+    expected = {(label, sparse_id(i), sparse_id(j))
+                for label, i, j in sub_graph_edges(allpath_algo.get_sub_graph(0, 3, "S", 5))}
+
+    allpath_algo: AllPathsProblem = algo()
+    allpath_algo.prepare(Graph.from_txt(path, compact_ids=True), grammar)
+    allpath_algo.solve()
+    allpath_algo.prepare_for_exctract_paths()
+    sub_graph = allpath_algo.get_sub_graph(sparse_id(0), sparse_id(3), "S", 5)
+
+    assert len(expected) != 0
+    assert sub_graph_edges(sub_graph) == expected
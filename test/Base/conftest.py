@@ -1,8 +1,8 @@
 import pytest
 
-from src.problems.Base.algo.matrix_base.matrix_base import MatrixBaseAlgo
+from src.problems.Base.algo.matrix_base.matrix_base import MatrixBaseAlgo, MatrixBaseSemiNaiveAlgo
 
 
-@pytest.fixture(params=[MatrixBaseAlgo])
+@pytest.fixture(params=[MatrixBaseAlgo, MatrixBaseSemiNaiveAlgo])
 def algo(request):
     return request.param
@@ -78,3 +78,20 @@ def test_two_nonterm(algo):
 
     result: ResultAlgo = base_algo.solve()
     assert result.matrix_S.nvals == 156
+
+
+@pytest.mark.CI
+def test_fast_path(algo, tmp_path):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('binary_tree')
+    grammar_path = tmp_path.joinpath('g.cfg')
+    with open(grammar_path, 'w') as f:
+        f.write('S -> a S | b S | a | b')
+    base_algo: BaseProblem = algo()
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'))
+    base_algo.prepare(graph, cfg_from_txt(grammar_path))
+    assert base_algo.regular_order is not None
+
+    base_algo.fast_path = False
+    expected = base_algo.solve().matrix_S
+    base_algo.fast_path = True
+    assert base_algo.solve().matrix_S.iseq(expected)
@@ -0,0 +1,175 @@
+import pytest
+from cfpq_data import cfg_from_txt
+
+from src.grammar.cnf_grammar import CnfGrammar
+from src.grammar.rsa import RecursiveAutomaton
+from src.grammar.grammar_cache import GRAMMAR_CACHE
+from src.grammar.rule_scheduler import RuleScheduler, find_strongly_connected_components
+
+from src.utils.useful_paths import LOCAL_CFPQ_DATA
+
+CASES = ['binary_tree', 'cycle', 'line', 'loop', 'single_vs_shortest', 'two_cycles', 'two_nonterm']
+
+
+@pytest.fixture
+def grammar_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(GRAMMAR_CACHE, 'cache_dir', tmp_path)
+    monkeypatch.setattr(GRAMMAR_CACHE, 'compiled', dict())
+    return GRAMMAR_CACHE
+
+
+def assert_cnf_equal(expected: CnfGrammar, actual: CnfGrammar):
+    assert actual.start_nonterm == expected.start_nonterm
+    assert actual.terms == expected.terms
+    assert actual.nonterms == expected.nonterms
+    assert actual.simple_rules == expected.simple_rules
+    assert actual.complex_rules == expected.complex_rules
+    assert actual.eps_rules == expected.eps_rules
+
+
+@pytest.mark.CI
+@pytest.mark.parametrize('case', CASES)
+def test_cnf_cache(case, grammar_cache):
+    cfg = cfg_from_txt(LOCAL_CFPQ_DATA.joinpath(case).joinpath('Grammars/g.cfg'))
+    expected = CnfGrammar.from_cfg(cfg, use_cache=False)
+
+    assert_cnf_equal(expected, CnfGrammar.from_cfg(cfg))
+    assert len(list(grammar_cache.cache_dir.iterdir())) == 1
+
+    # the second query takes rules from memory, a new process takes them from disk
+    assert_cnf_equal(expected, CnfGrammar.from_cfg(cfg))
+    grammar_cache.compiled.clear()
+    assert_cnf_equal(expected, CnfGrammar.from_cfg(cfg))
+
+
+@pytest.mark.CI
+@pytest.mark.parametrize('case', CASES)
+def test_rsa_cache(case, grammar_cache):
+    cfg = cfg_from_txt(LOCAL_CFPQ_DATA.joinpath(case).joinpath('Grammars/g.cfg'))
+    expected = RecursiveAutomaton.from_cfg(cfg, use_cache=False)
+
+    for _ in range(2):
+        grammar_cache.compiled.clear()
+        actual = RecursiveAutomaton.from_cfg(cfg)
+
+        assert actual.start_nonterm == expected.start_nonterm
+        assert actual.labels == expected.labels
+        assert actual.terminals == expected.terminals
+        assert actual.nonterminals == expected.nonterminals
+        assert actual.matrices_size == expected.matrices_size
+        assert actual.start_state == expected.start_state
+        assert actual.finish_states == expected.finish_states
+        assert actual.start_and_finish == expected.start_and_finish
+        assert actual.boxes == expected.boxes
+        assert actual.out_states == expected.out_states
+        for label in expected.labels:
+            assert actual[label].iseq(expected[label])
+
+
+@pytest.mark.CI
+def test_strongly_connected_components():
+    components = find_strongly_connected_components(['S', 'A', 'B', 'C'],
+                                                    {'S': ['A', 'B'], 'A': ['A', 'C'], 'B': ['S']})
+    assert [set(component) for component in components] == [{'C'}, {'A'}, {'S', 'B'}]
+
+
+@pytest.mark.CI
+def test_rule_scheduler():
+    grammar = CnfGrammar()
+    grammar.start_nonterm = 'S'
+    grammar['D'] = ['S', 'A']
+    grammar['S'] = ['A', 'B']
+    grammar['B'] = ['S', 'A']
+    grammar['A'] = ['a']
+    grammar['B'] = ['b']
+
+    scheduler = RuleScheduler(grammar)
+    assert [(stratum.nonterms, stratum.is_recursive) for stratum in scheduler.strata] == \
+           [({'S', 'B'}, True), ({'D'}, False)]
+
+    applied = []
+
+    def apply_rule(l, r1, r2):
+        applied.append(l)
+        return l == 'S' and applied.count('S') == 1
+
+    # S changes once, so B -> S A is recalculated and D -> S A is applied once after S and B are final
+    assert scheduler.run(apply_rule) == 3
+    assert applied == ['S', 'B', 'B', 'D']
+
+
+@pytest.mark.CI
+def test_optimize():
+    grammar = CnfGrammar()
+    grammar.start_nonterm = 'S'
+    grammar['S'] = ['A', 'B']
+    grammar['S'] = ['A', 'B']
+    grammar['S'] = ['A', 'C']
+    grammar['A'] = ['a']
+    grammar['B'] = ['b']
+    grammar['C'] = ['b']
+    grammar['D'] = ['d']
+    grammar['S'] = ['A', 'D']
+    grammar['E'] = ['a']
+    grammar['U'] = ['A', 'U']
+
+    # duplicate S -> A B, S -> A D with absent label d, unreachable E, unproductive U, C merged into B
+    optimization = grammar.optimize({'a', 'b'})
+    assert (optimization.rules_removed, optimization.nonterms_removed) == (7, 4)
+    assert grammar.complex_rules == [('S', 'A', 'B')]
+    assert grammar.simple_rules == [('A', 'a'), ('B', 'b')]
+    assert grammar.nonterms == {'S', 'A', 'B'}
+    assert grammar.terms == {'a', 'b'}
+
+
+@pytest.mark.CI
+def test_rsa_minimize():
+    # finals 3 and 5 of S are equivalent, 4 is unreachable, 10 is dead, A and B finish different boxes
+    compiled = {'start_nonterm': 'S', 'labels': ['a', 'S', 'b', 'x', 'y'], 'matrices_size': 11,
+                'boxes': {'S': [0, 1, 2, 3, 4, 5], 'A': [6, 7], 'B': [8, 9, 10]},
+                'start_state': {'S': 0, 'A': 6, 'B': 8},
+                'finish_states': {'S': [3, 5], 'A': [7], 'B': [9]},
+                'transitions': {'a': [[0, 1]], 'S': [[1, 2]], 'b': [[2, 3], [1, 5]], 'x': [[6, 7], [8, 9]],
+                                'y': [[8, 10], [4, 3]]}}
+
+    minimized = RecursiveAutomaton.minimize(compiled)
+
+    assert minimized['states_before_minimization'] == 11
+    assert minimized['matrices_size'] == 8
+    assert minimized['labels'] == ['a', 'S', 'b', 'x']
+    assert minimized['transitions']['b'] == [[2, 3], [1, 3]]
+    assert minimized['boxes'] == {'S': [0, 1, 2, 3], 'A': [4, 5], 'B': [6, 7]}
+    assert minimized['finish_states'] == {'S': [3], 'A': [5], 'B': [7]}
+
+    rsa = RecursiveAutomaton.from_compiled(minimized)
+    assert (rsa.minimization.states_before, rsa.minimization.states_after) == (11, 8)
+
+
+@pytest.mark.CI
+def test_rsa_regular_order():
+    # S -> a S | a: recursive call finishes the box
+    tail = {'start_nonterm': 'S', 'labels': ['a', 'S'], 'matrices_size': 3,
+            'boxes': {'S': [0, 1, 2]}, 'start_state': {'S': 0}, 'finish_states': {'S': [1, 2]},
+            'transitions': {'a': [[0, 1]], 'S': [[1, 2]]}}
+    assert RecursiveAutomaton.from_compiled(tail).get_regular_order() == [['S']]
+
+    # S -> a S b | a b: after recursive call b is read
+    nested = {'start_nonterm': 'S', 'labels': ['a', 'S', 'b'], 'matrices_size': 4,
+              'boxes': {'S': [0, 1, 2, 3]}, 'start_state': {'S': 0}, 'finish_states': {'S': [3]},
+              'transitions': {'a': [[0, 1]], 'S': [[1, 2]], 'b': [[2, 3], [1, 3]]}}
+    assert RecursiveAutomaton.from_compiled(nested).get_regular_order() is None
+
+    # S -> A b, A -> a: A is evaluated before S
+    acyclic = {'start_nonterm': 'S', 'labels': ['A', 'b', 'a'], 'matrices_size': 5,
+               'boxes': {'S': [0, 1, 2], 'A': [3, 4]}, 'start_state': {'S': 0, 'A': 3},
+               'finish_states': {'S': [2], 'A': [4]},
+               'transitions': {'A': [[0, 1]], 'b': [[1, 2]], 'a': [[3, 4]]}}
+    assert RecursiveAutomaton.from_compiled(acyclic).get_regular_order() == [['A'], ['S']]
+
+
+@pytest.mark.CI
+@pytest.mark.parametrize('case', CASES)
+def test_rsa_is_regular_cfg(case, grammar_cache):
+    cfg = cfg_from_txt(LOCAL_CFPQ_DATA.joinpath(case).joinpath('Grammars/g.cfg'))
+    rsa = RecursiveAutomaton.from_cfg(cfg)
+    assert RecursiveAutomaton.is_regular_cfg(cfg) == (rsa.get_regular_order() is not None)
@@ -0,0 +1,308 @@
+import pytest
+from cfpq_data import cfg_from_txt
+from pygraphblas import Matrix, BOOL
+
+from src.graph.graph import Graph
+from src.graph.label_graph import LabelGraph
+from src.graph.graph_meta import write_graph_meta
+from src.graph.graph_cache import GraphCache
+from src.graph.length_graph import SAVELENGTHTYPE
+from src.graph.index_graph import IndexGraph
+from src.graph.packed_index_graph import PackedIndexGraph, pack, unpack
+from src.problems.Base.algo.matrix_base.matrix_base import MatrixBaseAlgo
+
+from src.utils.useful_paths import LOCAL_CFPQ_DATA
+from src.utils.graph_size import get_graph_size
+
+CASES = ['binary_tree', 'cycle', 'line', 'loop', 'single_vs_shortest', 'two_cycles', 'two_nonterm']
+
+
+def load_by_elements(path):
+    size = get_graph_size(path)
+    matrices = dict()
+    with open(path, 'r') as f:
+        for line in f.readlines():
+            v, label, to = line.split()
+            v, to = int(v), int(to)
+            if label not in matrices:
+                matrices[label] = Matrix.sparse(BOOL, size, size)
+            matrices[label][v, to] = True
+    return size, matrices
+
+
+@pytest.mark.CI
+@pytest.mark.parametrize('case', CASES)
+def test_bulk_load_bool_graph(case):
+    path = LOCAL_CFPQ_DATA.joinpath(case).joinpath('Graphs/graph_1.txt')
+    size, expected = load_by_elements(path)
+
+    graph = Graph.from_txt(path)
+    graph.load_bool_graph()
+
+    assert graph.matrices_size == size
+    assert set(graph.matrices) == set(expected)
+    for label in expected:
+        assert graph[label].iseq(expected[label])
+
+
+@pytest.mark.CI
+@pytest.mark.parametrize('case', CASES)
+def test_bulk_load_label_graph(case):
+    path = LOCAL_CFPQ_DATA.joinpath(case).joinpath('Graphs/graph_1.txt')
+    size, expected = load_by_elements(path)
+
+    graph = LabelGraph.from_txt(path)
+
+    assert graph.matrices_size == size
+    assert set(graph.matrices) == set(expected)
+    for label in expected:
+        assert graph[label].iseq(expected[label])
+
+
+@pytest.mark.CI
+def test_size_from_meta(tmp_path):
+    path = tmp_path.joinpath('graph.txt')
+    path.write_text(LOCAL_CFPQ_DATA.joinpath('line/Graphs/graph_1.txt').read_text())
+    write_graph_meta(path, vertices=100)
+
+    graph = Graph.from_txt(path)
+    graph.load_bool_graph()
+
+    assert graph.matrices_size == 100
+    assert get_graph_size(path) == 100
+
+
+@pytest.mark.CI
+def test_load_from_cache(tmp_path):
+    path = tmp_path.joinpath('graph.txt')
+    path.write_text(LOCAL_CFPQ_DATA.joinpath('two_nonterm/Graphs/graph_1.txt').read_text())
+    size, expected = load_by_elements(path)
+
+    Graph.from_txt(path).save_cache()
+    assert GraphCache(path).is_fresh()
+
+    graph = Graph.from_txt(path)
+    graph.load_bool_graph()
+
+    assert graph.matrices_size == size
+    assert set(graph.matrices) == set(expected)
+    for label in expected:
+        assert graph[label].iseq(expected[label])
+
+    with open(path, 'a') as f:
+        f.write('0 new_label 1\n')
+    assert not GraphCache(path).is_fresh()
+
+    graph = Graph.from_txt(path)
+    graph.load_bool_graph()
+    assert 'new_label' in graph.matrices
+
+
+@pytest.mark.CI
+def test_cache_dir(tmp_path):
+    path = tmp_path.joinpath('graph.txt')
+    path.write_text(LOCAL_CFPQ_DATA.joinpath('two_nonterm/Graphs/graph_1.txt').read_text())
+    cache_dir = tmp_path.joinpath('cache')
+    size, expected = load_by_elements(path)
+
+    Graph.from_txt(path, cache_dir=cache_dir).save_cache()
+    assert GraphCache(path, cache_dir).is_fresh()
+    assert not GraphCache(path).exists()
+
+    graph = Graph.from_txt(path, cache_dir=cache_dir)
+    graph.load_bool_graph()
+
+    assert graph.matrices_size == size
+    for label in expected:
+        assert graph[label].iseq(expected[label])
+
+
+@pytest.mark.CI
+def test_load_only_query_labels():
+    path = LOCAL_CFPQ_DATA.joinpath('binary_tree/Graphs/graph_1.txt')
+    size, expected = load_by_elements(path)
+
+    graph = Graph.from_txt(path, use_cache=False)
+    graph.load_bool_graph(labels={'a'})
+
+    assert graph.matrices_size == size
+    assert set(graph.matrices) == {'a'}
+    assert graph['a'].iseq(expected['a'])
+    assert graph.skipped_edges == expected['b'].nvals
+
+
+@pytest.mark.CI
+def test_views_of_different_types():
+    path = LOCAL_CFPQ_DATA.joinpath('binary_tree/Graphs/graph_1.txt')
+    size, expected = load_by_elements(path)
+
+    graph = Graph.from_txt(path, use_cache=False)
+    graph.load_bool_graph(labels={'a'})
+    bool_view = graph.view()
+    a = bool_view['a']
+
+    graph.load_save_length_graph(labels={'a', 'b'})
+    length_view = graph.view()
+    graph.load_bool_graph(labels={'b'})
+
+    assert bool_view.type == BOOL and bool_view['a'] is a
+    assert bool_view['a'].iseq(expected['a'])
+    assert bool_view['b'].iseq(expected['b'])
+    assert length_view.type == SAVELENGTHTYPE
+    assert length_view['a'].type == SAVELENGTHTYPE and length_view['a'].nvals == expected['a'].nvals
+    assert length_view['b'].type == SAVELENGTHTYPE and length_view['b'].nvals == expected['b'].nvals
+    assert graph.view(typ=BOOL)['a'] is a
+
+
+@pytest.mark.CI
+def test_regular_solve_after_other_load(tmp_path):
+    path = LOCAL_CFPQ_DATA.joinpath('binary_tree/Graphs/graph_1.txt')
+    grammar_path = tmp_path.joinpath('g.cfg')
+    with open(grammar_path, 'w') as f:
+        f.write('S -> a S | b S | a | b')
+    grammar = cfg_from_txt(grammar_path)
+
+    algo = MatrixBaseAlgo()
+    algo.prepare(Graph.from_txt(path, use_cache=False), grammar)
+    expected = algo.solve().matrix_S
+
+    graph = Graph.from_txt(path, use_cache=False)
+    algo = MatrixBaseAlgo()
+    algo.prepare(graph, grammar)
+    # other query loads the shared graph with index type between prepare and solve
+    graph.load_save_length_graph()
+
+    assert algo.regular_order is not None
+    assert algo.solve().matrix_S.iseq(expected)
+
+
+@pytest.mark.CI
+def test_compact_ids(tmp_path):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('binary_tree')
+    grammar = cfg_from_txt(test_data_path.joinpath('Grammars/g.cfg'))
+
+    def sparse_id(v):
+        return 1000 * int(v) + 7
+
+    path = tmp_path.joinpath('graph.txt')
+    with open(test_data_path.joinpath('Graphs/graph_1.txt'), 'r') as f, open(path, 'w') as out:
+        for line in f.readlines():
+            v, label, to = line.split()
+            out.write(f'{sparse_id(v)} {label} {sparse_id(to)}\n')
+
+    algo = MatrixBaseAlgo()
+    algo.prepare(Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt')), grammar)
+    expected = {(sparse_id(i), sparse_id(j)) for i, j, _ in algo.solve().matrix_S}
+
+    graph = Graph.from_txt(path, compact_ids=True)
+    algo = MatrixBaseAlgo()
+    algo.prepare(graph, grammar)
+    result = algo.solve().matrix_S
+
+    assert graph.matrices_size == len(graph.vertex_map) < get_graph_size(path)
+    assert {(i, j) for i, j, _ in result} == expected
+
+
+@pytest.mark.CI
+@pytest.mark.parametrize('case', CASES)
+def test_parallel_load(case):
+    path = LOCAL_CFPQ_DATA.joinpath(case).joinpath('Graphs/graph_1.txt')
+    size, expected = load_by_elements(path)
+
+    graph = Graph.from_txt(path, use_cache=False, workers=2)
+    graph.load_bool_graph()
+
+    assert graph.matrices_size == size
+    assert set(graph.matrices) == set(expected)
+    for label in expected:
+        assert graph[label].iseq(expected[label])
+
+
+@pytest.mark.CI
+def test_lazy_label_lookup():
+    graph = LabelGraph(4)
+
+    assert graph['missing'].nvals == 0
+    assert graph['missing'] is graph['other']
+    assert 'missing' not in graph.matrices
+
+    with pytest.raises(TypeError):
+        graph['missing'][0, 1] = True
+    with pytest.raises(TypeError):
+        graph['missing'].resize(8, 8)
+    with pytest.raises(TypeError):
+        graph['missing'].apply(BOOL.LNOT, out=graph['missing'])
+
+    graph['a'] += Matrix.from_lists([0], [1], [True], nrows=4, ncols=4)
+    assert graph['a'].nvals == 1
+    assert graph['missing'].nvals == 0
+
+    graph.allocate('b')[2, 3] = True
+    assert graph['b'].nvals == 1
+
+    graph.allocate('c')
+    assert graph.prune() == ['c']
+    assert graph.prune(used={'a'}) == ['b']
+    assert set(graph.matrices) == {'a'}
+
+    # write into the shared matrix by operation of other matrix is found on the next read
+    graph['a'].apply(BOOL.IDENTITY, out=graph['missing'])
+    with pytest.raises(TypeError):
+        graph['missing']
+    assert graph['missing'].nvals == 0
+
+
+@pytest.mark.CI
+def test_inverse_labels(tmp_path):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('binary_tree')
+    grammar_path = tmp_path.joinpath('g.cfg')
+    with open(grammar_path, 'w') as f:
+        f.write('S -> a S a_r | a a_r')
+    grammar = cfg_from_txt(grammar_path)
+
+    with_inverse_path = tmp_path.joinpath('with_inverse.txt')
+    with open(test_data_path.joinpath('Graphs/graph_1.txt'), 'r') as f, open(with_inverse_path, 'w') as out:
+        for line in f.readlines():
+            v, label, to = line.split()
+            out.write(f'{v} {label} {to}\n{to} {label}_r {v}\n')
+
+    algo = MatrixBaseAlgo()
+    algo.prepare(Graph.from_txt(with_inverse_path), grammar)
+    expected = algo.solve().matrix_S
+
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'), inverse_suffix='_r')
+    algo = MatrixBaseAlgo()
+    algo.prepare(graph, grammar)
+
+    assert algo.solve().matrix_S.iseq(expected)
+    assert graph['a_r'].iseq(graph['a'].transpose())
+    assert graph['b_r'].nvals == 0
+
+    # derivation is disabled by default
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'))
+    graph.load_bool_graph()
+    assert graph['a_r'].nvals == 0
+
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'), inverse_suffix='_r')
+    graph.load_bool_graph()
+    assert 'a_r' in graph.matrices and 'b_r' in graph.matrices
+
+
+@pytest.mark.CI
+def test_packed_index():
+    assert unpack(pack(3, 17)) == (3, 17)
+    # minimum of packed values is the element with the minimal key
+    assert min(pack(2, 100), pack(3, 0)) == pack(2, 100)
+    assert min(pack(2, 5), pack(2, 4)) == pack(2, 4)
+
+
+@pytest.mark.CI
+def test_element_bytes():
+    packed = PackedIndexGraph(4)
+    packed.allocate('S')[0, 1] = pack(1, 2)
+    packed.allocate('A')[1, 2] = pack(1, 2)
+    assert packed.element_bytes() == 2 * 8
+
+    udt = IndexGraph(4)
+    udt.allocate('S')[0, 1] = (0, 1, 2, 1, 1)
+    assert udt.element_bytes() == 5 * 4
@@ -1,8 +1,9 @@
 import pytest
 
-from src.problems.SinglePath.algo.matrix_shortest_path.matrix_shortest_path_index import MatrixShortestAlgo
+from src.problems.SinglePath.algo.matrix_shortest_path.matrix_shortest_path_index import MatrixShortestAlgo, \
+    MatrixShortestPackedAlgo
 
 
-@pytest.fixture(params=[MatrixShortestAlgo])
+@pytest.fixture(params=[MatrixShortestAlgo, MatrixShortestPackedAlgo])
 def algo(request):
     return request.param
\ No newline at end of file
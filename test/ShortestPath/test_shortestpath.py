@@ -18,8 +18,10 @@ def test_binary_tree(algo):
     result: ResultAlgo = shortestpath_algo.solve()
     assert result.matrix_S.nvals == 2
 
-    length = shortestpath_algo.getPath(0, 7, "S")
-    assert length == 6
+    path = shortestpath_algo.getPath(0, 7, "S")
+    assert len(path) == 6
+    assert path[0][0] == 0 and path[-1][1] == 7
+    assert all(path[1:, 0] == path[:-1, 1])
 
 @pytest.mark.CI
 def test_binary_tree(algo):
@@ -31,3 +33,45 @@ def test_binary_tree(algo):
 
     result: ResultAlgo = shortestpath_algo.solve()
     assert result.matrix_S.nvals == 20
+
+@pytest.mark.CI
+def test_paths_batch(algo):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('single_vs_shortest')
+    shortestpath_algo: SinglePathProblem = algo()
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'))
+    grammar = cfg_from_txt(test_data_path.joinpath('Grammars/g.cfg'))
+    shortestpath_algo.prepare(graph, grammar)
+
+    result: ResultAlgo = shortestpath_algo.solve()
+    rows, cols, _ = result.matrix_S.to_lists()
+    offsets, edges = shortestpath_algo.get_paths_batch(list(zip(rows, cols)), "S")
+    assert len(offsets) == len(rows) + 1
+    for k, (i, j) in enumerate(zip(rows, cols)):
+        assert (edges[offsets[k]:offsets[k + 1]] == shortestpath_algo.getPath(i, j, "S")).all()
+
+
+@pytest.mark.CI
+def test_inverse_labels(algo, tmp_path):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('binary_tree')
+    grammar_path = tmp_path.joinpath('g.cfg')
+    with open(grammar_path, 'w') as f:
+        f.write('S -> a S a_r | a a_r')
+    shortestpath_algo: SinglePathProblem = algo()
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'), inverse_suffix='_r')
+    shortestpath_algo.prepare(graph, cfg_from_txt(grammar_path))
+
+    edges = set()
+    with open(test_data_path.joinpath('Graphs/graph_1.txt'), 'r') as f:
+        for line in f.readlines():
+            v, label, to = line.split()
+            if label == 'a':
+                edges.update({(int(v), int(to)), (int(to), int(v))})
+
+    result: ResultAlgo = shortestpath_algo.solve()
+    rows, cols, _ = result.matrix_S.to_lists()
+    assert len(rows) != 0
+    for i, j in zip(rows, cols):
+        path = shortestpath_algo.getPath(i, j, "S")
+        assert path[0][0] == i and path[-1][1] == j
+        assert all(path[1:, 0] == path[:-1, 1])
+        assert all((v, to) in edges for v, to in path.tolist())
@@ -1,8 +1,9 @@
 import pytest
 
-from src.problems.SinglePath.algo.matrix_single_path.matrix_single_path_index import MatrixSingleAlgo
+from src.problems.SinglePath.algo.matrix_single_path.matrix_single_path_index import MatrixSingleAlgo, \
+    MatrixSingleUdtAlgo
 
 
-@pytest.fixture(params=[MatrixSingleAlgo])
+@pytest.fixture(params=[MatrixSingleAlgo, MatrixSingleUdtAlgo])
 def algo(request):
     return request.param
@@ -20,7 +20,7 @@ def test_binary_tree(algo):
     assert result.matrix_S.nvals == 20
 
     paths = singlepath_algo.getPath(0, 3, "S")
-    assert paths == 4
+    assert len(paths) == 4
 
 
 @pytest.mark.CI
@@ -35,7 +35,7 @@ def test_cycle(algo):
     assert result.matrix_S.nvals == 9
 
     paths = singlepath_algo.getPath(0, 1, "S")
-    assert paths == 1
+    assert len(paths) == 1
 
 
 @pytest.mark.CI
@@ -50,7 +50,8 @@ def test_line(algo):
     assert result.matrix_S.nvals == 2
 
     paths = singlepath_algo.getPath(0, 4, "S")
-    assert paths == 4
+    assert len(paths) == 4
+    assert paths.tolist() == [[0, 1], [1, 2], [2, 3], [3, 4]]
 
 
 @pytest.mark.CI
@@ -65,7 +66,7 @@ def test_loop(algo):
     assert result.matrix_S.nvals == 1
 
     paths = singlepath_algo.getPath(0, 0, "S")
-    assert paths == 1
+    assert len(paths) == 1
 
 
 @pytest.mark.CI
@@ -80,7 +81,7 @@ def test_two_cycles(algo):
     assert result.matrix_S.nvals == 6
 
     paths = singlepath_algo.getPath(1, 3, "S")
-    assert paths == 2
+    assert len(paths) == 2
 
 
 @pytest.mark.CI
@@ -95,4 +96,64 @@ def test_two_nonterm(algo):
     assert result.matrix_S.nvals == 156
 
     paths = singlepath_algo.getPath(1, 1, "S")
-    assert paths == 2
+    assert len(paths) == 2
+
+
+@pytest.mark.CI
+def test_paths_batch(algo):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('two_nonterm')
+    singlepath_algo: SinglePathProblem = algo()
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'))
+    grammar = cfg_from_txt(test_data_path.joinpath('Grammars/g.cfg'))
+    singlepath_algo.prepare(graph, grammar)
+
+    result: ResultAlgo = singlepath_algo.solve()
+    rows, cols, _ = result.matrix_S.to_lists()
+    offsets, edges = singlepath_algo.get_paths_batch(list(zip(rows, cols)), "S")
+    assert len(offsets) == len(rows) + 1
+    for k, (i, j) in enumerate(zip(rows, cols)):
+        assert (edges[offsets[k]:offsets[k + 1]] == singlepath_algo.getPath(i, j, "S")).all()
+
+
+@pytest.mark.CI
+def test_missing_path(algo):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('binary_tree')
+    singlepath_algo: SinglePathProblem = algo()
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'))
+    grammar = cfg_from_txt(test_data_path.joinpath('Grammars/g.cfg'))
+    singlepath_algo.prepare(graph, grammar)
+
+    result: ResultAlgo = singlepath_algo.solve()
+    size = result.matrix_S.nrows
+    i, j = next((i, j) for i in range(size) for j in range(size) if (i, j) not in result.matrix_S)
+    with pytest.raises(ValueError):
+        singlepath_algo.getPath(i, j, "S")
+    with pytest.raises(ValueError):
+        singlepath_algo.get_paths_batch([(i, j)], "S")
+
+
+@pytest.mark.CI
+def test_inverse_labels(algo, tmp_path):
+    test_data_path = LOCAL_CFPQ_DATA.joinpath('binary_tree')
+    grammar_path = tmp_path.joinpath('g.cfg')
+    with open(grammar_path, 'w') as f:
+        f.write('S -> a S a_r | a a_r')
+    singlepath_algo: SinglePathProblem = algo()
+    graph = Graph.from_txt(test_data_path.joinpath('Graphs/graph_1.txt'), inverse_suffix='_r')
+    singlepath_algo.prepare(graph, cfg_from_txt(grammar_path))
+
+    edges = set()
+    with open(test_data_path.joinpath('Graphs/graph_1.txt'), 'r') as f:
+        for line in f.readlines():
+            v, label, to = line.split()
+            if label == 'a':
+                edges.update({(int(v), int(to)), (int(to), int(v))})
+
+    result: ResultAlgo = singlepath_algo.solve()
+    rows, cols, _ = result.matrix_S.to_lists()
+    assert len(rows) != 0
+    for i, j in zip(rows, cols):
+        path = singlepath_algo.getPath(i, j, "S")
+        assert path[0][0] == i and path[-1][1] == j
+        assert all(path[1:, 0] == path[:-1, 1])
+        assert all((v, to) in edges for v, to in path.tolist())
@@ -0,0 +1,45 @@
+import pytest
+from pygraphblas import Matrix, BOOL
+
+from src.graph.graph import Graph
+from src.utils.closure import transitive_closure, update_closure, CLOSURE_STRATEGIES
+
+from src.utils.useful_paths import LOCAL_CFPQ_DATA
+
+CASES = ['binary_tree', 'cycle', 'line', 'loop', 'single_vs_shortest', 'two_cycles', 'two_nonterm']
+
+
+def load_edges(case):
+    graph = Graph.from_txt(LOCAL_CFPQ_DATA.joinpath(case).joinpath('Graphs/graph_1.txt'))
+    graph.load_bool_graph()
+    edges = Matrix.sparse(BOOL, graph.matrices_size, graph.matrices_size)
+    for label in graph:
+        edges += graph[label]
+    return edges
+
+
+@pytest.mark.CI
+@pytest.mark.parametrize('case', CASES)
+@pytest.mark.parametrize('strategy', CLOSURE_STRATEGIES)
+def test_closure_strategies(case, strategy):
+    expected = load_edges(case)
+    transitive_closure(expected, 'naive')
+
+    m = load_edges(case)
+    transitive_closure(m, strategy)
+    assert m.iseq(expected)
+
+
+@pytest.mark.CI
+def test_chain_closure():
+    size = 64
+    chain = Matrix.from_lists(list(range(size - 1)), list(range(1, size)), [True] * (size - 1),
+                              nrows=size, ncols=size, typ=BOOL)
+
+    m = chain.dup()
+    assert transitive_closure(m, 'squaring') <= 7
+    assert m.nvals == size * (size - 1) // 2
+
+    # closure is updated by new edge that connects the end of chain with its start
+    update_closure(m, Matrix.from_lists([size - 1], [0], [True], nrows=size, ncols=size, typ=BOOL))
+    assert m.nvals == size * size
@@ -0,0 +1,21 @@
+import pytest
+from pygraphblas import Matrix, BOOL
+
+from src.utils.diagonal import diagonal, identity, rows_diagonal, columns_diagonal
+
+
+@pytest.mark.CI
+def test_diagonal():
+    m = diagonal([3, 1, 4], 5)
+    assert sorted((i, j) for i, j, _ in m) == [(1, 1), (3, 3), (4, 4)]
+    assert m.nrows == 5 and m.ncols == 5
+
+    assert identity(5).nvals == 5
+    assert all(i == j for i, j, _ in identity(5))
+
+
+@pytest.mark.CI
+def test_rows_and_columns_diagonal():
+    m = Matrix.from_lists([0, 0, 2], [1, 3, 3], [True] * 3, nrows=4, ncols=4, typ=BOOL)
+    assert sorted(i for i, _, _ in rows_diagonal(m)) == [0, 2]
+    assert sorted(j for j, _, _ in columns_diagonal(m)) == [1, 3]
@@ -1,7 +1,19 @@
+import pytest
+
+from src.grammar.grammar_cache import GRAMMAR_CACHE
 from src.utils.useful_paths import GLOBAL_CFPQ_DATA, LOCAL_CFPQ_DATA
 from test.suites.cfpq_data import *
 
 
+@pytest.fixture(autouse=True, scope='session')
+def grammar_cache_dir(tmp_path_factory):
+    """
+    Compiled grammars of tests are cached in temporary directory, not in the user cache
+    """
+    GRAMMAR_CACHE.cache_dir = tmp_path_factory.mktemp('grammar_cache')
+    return GRAMMAR_CACHE.cache_dir
+
+
 def pytest_configure(config):
     config.addinivalue_line(
         'markers', 'CI: small test to run in CI'